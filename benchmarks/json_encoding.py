@@ -0,0 +1,90 @@
+"""
+Compare the ways /human_query can encode a query result.
+
+  pydantic  the previous path: SQLQueryResult validation, jsonable_encoder and
+            JSONResponse (what FastAPI does for a response_model)
+  fast      query_result(): the rows encoded directly by encode_json (orjson)
+  json      encode_json with the json module fallback (orjson not installed)
+
+Rows mimic actividad_diaria: text, DATE, integer counts and NUMERIC values as
+RealDictCursor returns them. Runs without a database:
+
+    python benchmarks/json_encoding.py --rows 5000 --repeat 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import app  # noqa: E402
+
+def make_rows(count: int):
+    start = date(2025, 5, 1)
+    return [
+        {
+            "fecha": start + timedelta(days=i % 30),
+            "zonal": f"ZONAL {i % 7}",
+            "supervisor": f"SUPERVISOR {i % 40}",
+            "dni": f"{70000000 + i}",
+            "nombre": f"VENDEDOR {i}",
+            "hc": 1,
+            "login": i % 2,
+            "asisth": i % 3 != 0,
+            "hc_c_vta": i % 2,
+            "ventas": Decimal(i % 5),
+            "couta": 120,
+            "cobertura": Decimal(i % 5) / Decimal(120),
+        }
+        for i in range(count)
+    ]
+
+def pydantic_path(rows):
+    result = app.SQLQueryResult(original_query="q", sql_query="SELECT 1", result=rows)
+    return JSONResponse(jsonable_encoder(result)).body
+
+def fast_path(rows):
+    return app.query_result("q", "SELECT 1", rows).body
+
+def json_path(rows):
+    with mock.patch.object(app, "orjson", None):
+        return app.query_result("q", "SELECT 1", rows).body
+
+def measure(function, rows, repeat: int):
+    function(rows)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = function(rows)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), len(body)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    paths = [("pydantic", pydantic_path), ("fast", fast_path)]
+    if app.orjson is not None:
+        paths.append(("json", json_path))
+    else:
+        print("orjson is not installed: the fast path uses the json module")
+    print(f"{'rows':>8} {'path':<10} {'median ms':>10} {'bytes':>10} {'speedup':>8}")
+    for count in args.rows:
+        rows = make_rows(count)
+        baseline = None
+        for name, function in paths:
+            seconds, size = measure(function, rows, args.repeat)
+            baseline = baseline or seconds
+            print(f"{count:>8} {name:<10} {seconds * 1000:>10.2f} {size:>10} {baseline / seconds:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Time until the SQL is available (when execution can start) for a buffered
+and a streamed completion, against a stub LLM that generates one token every
+--token-ms milliseconds: the SQL, then a closing remark, as chat models often
+write. Buffered, the stub answers when the whole completion is generated;
+streamed, request_sql_completion stops reading at the terminating ';'.
+
+Then the connections a run of streamed calls opens against a local HTTP/1.1
+server: stopping early closes the connection unless the rest of the stream
+is drained in the background (LLM_STREAM_DRAIN_TIMEOUT), and against a real
+provider every new connection costs a TLS handshake.
+
+    python benchmarks/llm_streaming.py --token-ms 20 --tail-tokens 60
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import app  # noqa: E402
+
+SQL = """```sql
+SELECT rs.zonal, rs.supervisor, rs.total_ventas, rs.couta, rs.cobertura
+FROM public.resumen_supervisor_diario rs
+WHERE rs.fecha = '2025-05-06' AND rs.supervisor IS NOT NULL
+ORDER BY rs.zonal, rs.supervisor;
+```
+"""
+TAIL = "Esta consulta devuelve las ventas, la cuota y la cobertura de cada supervisor. "
+
+def tokens(tail_tokens: int):
+    words = SQL.split(" ")
+    sql_tokens = [word + " " for word in words[:-1]] + [words[-1]]
+    tail = (TAIL * (tail_tokens // len(TAIL.split()) + 1)).split()[:tail_tokens]
+    return sql_tokens + [word + " " for word in tail]
+
+def stub_transport(token_ms: float, tail_tokens: int) -> httpx.MockTransport:
+    parts = tokens(tail_tokens)
+    usage = {"prompt_tokens": 1500, "completion_tokens": len(parts)}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        if not payload.get("stream"):
+            await asyncio.sleep(len(parts) * token_ms / 1000)
+            return httpx.Response(200, json={"choices": [{"message": {"content": "".join(parts)}}], "usage": usage})
+
+        async def events():
+            for part in parts:
+                await asyncio.sleep(token_ms / 1000)
+                yield f"data: {json.dumps({'choices': [{'delta': {'content': part}}]})}\n\n".encode()
+            yield f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n".encode()
+            yield b"data: [DONE]\n\n"
+
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=events())
+
+    return httpx.MockTransport(handler)
+
+async def serve_http1(token_ms: float, tail_tokens: int, counts: dict):
+    """A plain HTTP/1.1 server streaming the completion as chunked SSE; counts the connections it accepts."""
+    parts = tokens(tail_tokens)
+
+    async def handle(reader, writer):
+        counts["connections"] += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = next((int(line.split(b":")[1]) for line in head.split(b"\r\n") if line.lower().startswith(b"content-length:")), 0)
+                await reader.readexactly(length)
+                writer.write(b"HTTP/1.1 200 OK\r\ncontent-type: text/event-stream\r\ntransfer-encoding: chunked\r\n\r\n")
+                for part in parts:
+                    await asyncio.sleep(token_ms / 1000)
+                    event = f"data: {json.dumps({'choices': [{'delta': {'content': part}}]})}\n\n".encode()
+                    writer.write(b"%x\r\n%s\r\n" % (len(event), event))
+                    await writer.drain()
+                event = b"data: [DONE]\n\n"
+                writer.write(b"%x\r\n%s\r\n0\r\n\r\n" % (len(event), event))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+async def measure_connections(token_ms: float, tail_tokens: int, repeat: int, drain_timeout: float):
+    counts = {"connections": 0}
+    server = await serve_http1(token_ms, tail_tokens, counts)
+    port = server.sockets[0].getsockname()[1]
+    app.LLM_STREAM_DRAIN_TIMEOUT = drain_timeout
+    app.DEEPSEEK_API_URL = f"http://127.0.0.1:{port}/chat/completions"
+    app.llm_client = httpx.AsyncClient()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        completion = await app.request_sql_completion({"model": "stub", "messages": [], "stream": True})
+        timings.append(time.perf_counter() - started)
+        assert completion["stopped_early"], completion
+        # Requests arrive one after the other, after the previous tail was read
+        await asyncio.gather(*app.llm_stream_drains)
+    await app.llm_client.aclose()
+    server.close()
+    return counts["connections"], statistics.median(timings)
+
+async def measure(stream: bool, repeat: int):
+    payload = {"model": "stub", "messages": [], "stream": stream}
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        completion = await app.request_sql_completion(payload)
+        timings.append(time.perf_counter() - started)
+        assert completion["error"] is None and completion["sql"].endswith(";"), completion
+    return statistics.median(timings), completion
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--token-ms", type=float, default=20)
+    parser.add_argument("--tail-tokens", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    app.llm_client = httpx.AsyncClient(transport=stub_transport(args.token_ms, args.tail_tokens))
+    sql_tokens = len(tokens(0))
+    print(f"{sql_tokens} SQL tokens + {args.tail_tokens} trailing tokens, {args.token_ms:g} ms per token")
+    buffered, _ = await measure(False, args.repeat)
+    streamed, completion = await measure(True, args.repeat)
+    print(f"buffered  time to SQL {buffered * 1000:8.1f} ms")
+    print(f"streamed  time to SQL {streamed * 1000:8.1f} ms  (stopped early: {completion['stopped_early']})")
+    print(f"saved {100 * (1 - streamed / buffered):.0f}%")
+    await app.llm_client.aclose()
+
+    for label, drain_timeout in (("closed early", 0), ("drained", 10)):
+        connections, median = await measure_connections(args.token_ms, args.tail_tokens, args.repeat, drain_timeout)
+        print(f"{label:12}  time to SQL {median * 1000:8.1f} ms, {args.repeat} calls opened {connections} connection(s)")
+
+if __name__ == "__main__":
+    asyncio.run(main())
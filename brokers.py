@@ -0,0 +1,188 @@
+import abc
+import asyncio
+import json
+import logging
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+class BrokerError(Exception):
+    """A job failed on the worker."""
+
+class BrokerTimeout(BrokerError):
+    """No worker replied in time."""
+
+class Broker(abc.ABC):
+    """
+    Request/reply over a work queue. The API ``call``s with a payload and
+    waits for the reply with the same correlation id; worker processes
+    ``serve`` the queue, running at most ``prefetch`` jobs at a time each.
+
+    Payloads and replies are serialized with ``dumps`` (bytes) and
+    ``json.loads``, as they would be on the wire. Failures to reach the
+    queue are raised as BrokerError, like failed jobs.
+    """
+
+    def __init__(self, dumps: Callable[[Any], bytes]):
+        self.dumps = dumps
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._stats = {"calls": 0, "errors": 0, "publish_errors": 0, "timeouts": 0, "served": 0, "late_replies": 0}
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def call(self, payload: Dict[str, Any], timeout: float) -> Any:
+        """Publish a job and return the worker's result; raises BrokerError or BrokerTimeout."""
+        correlation_id = uuid.uuid4().hex
+        reply = asyncio.get_running_loop().create_future()
+        self._pending[correlation_id] = reply
+        self._stats["calls"] += 1
+        try:
+            try:
+                await self._publish(correlation_id, self.dumps(payload), timeout)
+            except Exception as e:
+                self._stats["publish_errors"] += 1
+                raise BrokerError(f"Could not publish the job: {e}") from e
+            body = await asyncio.wait_for(reply, timeout)
+        except asyncio.TimeoutError:
+            self._stats["timeouts"] += 1
+            raise BrokerTimeout(f"No worker replied within {timeout:g} seconds")
+        finally:
+            self._pending.pop(correlation_id, None)
+        message = json.loads(body)
+        if message.get("error") is not None:
+            self._stats["errors"] += 1
+            raise BrokerError(message["error"])
+        return message["result"]
+
+    def _reply(self, correlation_id: Optional[str], body: bytes):
+        """Resolve the call waiting for ``correlation_id``; replies to timed-out calls are dropped."""
+        reply = self._pending.get(correlation_id)
+        if reply is None or reply.done():
+            self._stats["late_replies"] += 1
+            return
+        reply.set_result(body)
+
+    async def _handle(self, handler: Handler, body: bytes) -> bytes:
+        """Run one job and encode its reply; a failing job replies with its error."""
+        try:
+            result = await handler(json.loads(body))
+            reply = {"result": result, "error": None}
+        except Exception as e:
+            logger.error(f"Job failed: {e}")
+            reply = {"result": None, "error": str(e) or type(e).__name__}
+        self._stats["served"] += 1
+        return self.dumps(reply)
+
+    @abc.abstractmethod
+    async def _publish(self, correlation_id: str, body: bytes, timeout: float):
+        """Send a job to the queue."""
+
+    @abc.abstractmethod
+    async def serve(self, handler: Handler, prefetch: int):
+        """Consume jobs until cancelled."""
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": type(self).__name__, "waiting": len(self._pending), **self._stats}
+
+class LocalBroker(Broker):
+    """In-process stand-in for RabbitMQ: same request/reply flow over an asyncio queue."""
+
+    def __init__(self, dumps: Callable[[Any], bytes]):
+        super().__init__(dumps)
+        self._queue: Optional[asyncio.Queue] = None
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+
+    async def _publish(self, correlation_id: str, body: bytes, timeout: float):
+        self._queue.put_nowait((correlation_id, body))
+
+    async def serve(self, handler: Handler, prefetch: int):
+        async def consume():
+            while True:
+                correlation_id, body = await self._queue.get()
+                self._reply(correlation_id, await self._handle(handler, body))
+
+        await asyncio.gather(*(consume() for _ in range(prefetch)))
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "queued": self._queue.qsize() if self._queue is not None else 0}
+
+class RabbitMQBroker(Broker):
+    """
+    Jobs go to the durable ``queue`` on RabbitMQ; each caller process gets an
+    exclusive reply queue and matches replies by correlation id. Workers ack
+    a job only after replying, so the jobs of a worker that dies are
+    redelivered to another one. Needs the optional aio_pika package.
+    """
+
+    def __init__(self, url: str, queue: str, dumps: Callable[[Any], bytes]):
+        super().__init__(dumps)
+        self.url = url
+        self.queue = queue
+        self._connection = None
+        self._channel = None
+        self._reply_queue = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def start(self):
+        import aio_pika
+
+        self._connection = await aio_pika.connect_robust(self.url)
+        self._channel = await self._connection.channel()
+        await self._channel.declare_queue(self.queue, durable=True)
+        self._reply_queue = await self._channel.declare_queue(exclusive=True, auto_delete=True)
+        await self._reply_queue.consume(self._on_reply, no_ack=True)
+
+    async def stop(self):
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+    async def _on_reply(self, message):
+        self._reply(message.correlation_id, message.body)
+
+    async def _publish(self, correlation_id: str, body: bytes, timeout: float):
+        import aio_pika
+
+        message = aio_pika.Message(
+            body=body,
+            content_type="application/json",
+            correlation_id=correlation_id,
+            reply_to=self._reply_queue.name,
+            # Nobody waits for the reply after the timeout, so don't run the job either
+            expiration=timeout
+        )
+        await self._channel.default_exchange.publish(message, routing_key=self.queue)
+
+    async def serve(self, handler: Handler, prefetch: int):
+        import aio_pika
+
+        # A separate channel, so the prefetch limit only applies to consuming jobs
+        channel = await self._connection.channel()
+        await channel.set_qos(prefetch_count=prefetch)
+        queue = await channel.declare_queue(self.queue, durable=True)
+
+        async def process(message):
+            async with message.process(requeue=True):
+                body = await self._handle(handler, message.body)
+                if message.reply_to:
+                    reply = aio_pika.Message(body=body, content_type="application/json", correlation_id=message.correlation_id)
+                    await channel.default_exchange.publish(reply, routing_key=message.reply_to)
+
+        try:
+            async with queue.iterator() as messages:
+                async for message in messages:
+                    # RabbitMQ delivers at most ``prefetch`` unacked jobs, which bounds these tasks
+                    task = asyncio.create_task(process(message))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+        finally:
+            await channel.close()
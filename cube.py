@@ -0,0 +1,278 @@
+import threading
+import time
+from datetime import date as date_type
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Cube over actividad_diaria: fecha x zonal x supervisor x vendor
+DIMENSIONS = ("fecha", "zonal", "supervisor", "dni")
+# Label columns decoded only for output (one nombre per dni)
+ATTRIBUTES = ("nombre",)
+MEASURES = ("hc", "login", "asisth", "hc_c_vta", "ventas", "couta")
+# Derived from the aggregated measures
+RATIOS = ("cobertura",)
+COLUMNS = DIMENSIONS + ATTRIBUTES + MEASURES
+
+EPOCH = date_type(1970, 1, 1)
+
+def to_day(value: Any) -> int:
+    """Date or YYYY-MM-DD string as days since 1970-01-01."""
+    if isinstance(value, str):
+        value = date_type.fromisoformat(value)
+    return (value - EPOCH).days
+
+def to_month(days: np.ndarray) -> np.ndarray:
+    """Days since 1970-01-01 as months since January 1970."""
+    return days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+
+def from_day(day: int) -> str:
+    return date_type.fromordinal(EPOCH.toordinal() + int(day)).isoformat()
+
+class Dictionary:
+    """Append-only mapping between labels and the int32 codes stored in the cube."""
+
+    def __init__(self):
+        self.labels: List[Any] = []
+        self._codes: Dict[Any, int] = {}
+
+    def encode(self, values: Sequence[Any]) -> np.ndarray:
+        codes = np.empty(len(values), dtype=np.int32)
+        for i, value in enumerate(values):
+            code = self._codes.get(value)
+            if code is None:
+                code = self._codes[value] = len(self.labels)
+                self.labels.append(value)
+            codes[i] = code
+        return codes
+
+    def lookup(self, values: Sequence[Any]) -> np.ndarray:
+        """Codes of known labels; unknown labels are dropped."""
+        return np.array([self._codes[v] for v in values if v in self._codes], dtype=np.int32)
+
+    def copy(self) -> "Dictionary":
+        copy = Dictionary()
+        copy.labels = list(self.labels)
+        copy._codes = dict(self._codes)
+        return copy
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+class CubeSnapshot:
+    """Immutable set of column arrays; queries read one snapshot while a new one is built."""
+
+    def __init__(self, columns: Dict[str, np.ndarray], dictionaries: Dict[str, Dictionary], names: np.ndarray):
+        self.columns = columns
+        self.dictionaries = dictionaries
+        # nombre per dni code
+        self.names = names
+        self.rows = len(columns["fecha"])
+
+    def nbytes(self) -> int:
+        arrays = sum(array.nbytes for array in self.columns.values()) + self.names.nbytes
+        labels = sum(len(str(label)) for dictionary in self.dictionaries.values() for label in dictionary.labels)
+        return arrays + labels
+
+class SalesCube:
+    """
+    Columnar in-memory copy of actividad_diaria for slice and group-by queries.
+
+    Dimensions are dictionary encoded into int32 arrays (fecha as days since
+    the epoch), measures are int64 arrays. Rows are kept sorted by fecha, so
+    a date filter is a binary search plus a slice. ``build`` loads the full table and
+    ``replace_dates`` swaps in the rows of a date range after a load, so an
+    update only re-reads the dates that changed. Every update builds a new
+    snapshot and swaps it in, so queries never lock.
+
+    ``couta`` is a supervisor's monthly quota, repeated on every row of the
+    month: a group counts the maximum per supervisor and month once, summed
+    over the supervisors and months it covers. ``cobertura`` is ventas / couta,
+    so for a single day it matches the reports and over a month it is the
+    month's coverage.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Serializes builds and updates; queries only read the current snapshot
+        self._update_lock = threading.Lock()
+        self._snapshot: Optional[CubeSnapshot] = None
+        self._stats = {"builds": 0, "updates": 0, "queries": 0, "build_seconds": None, "update_seconds": None, "built_at": None}
+
+    @property
+    def ready(self) -> bool:
+        return self._snapshot is not None
+
+    def _encode(self, rows: Dict[str, Sequence[Any]], dictionaries: Dict[str, Dictionary]) -> Dict[str, np.ndarray]:
+        """Encode ``rows`` into column arrays sorted by fecha."""
+        columns = {"fecha": np.array([to_day(value) for value in rows["fecha"]], dtype=np.int32)}
+        for dimension in DIMENSIONS[1:]:
+            columns[dimension] = dictionaries[dimension].encode(rows[dimension])
+        for measure in MEASURES:
+            columns[measure] = np.asarray(rows[measure], dtype=np.int64)
+        order = np.argsort(columns["fecha"], kind="stable")
+        return {name: array[order] for name, array in columns.items()}
+
+    def _names(self, previous: np.ndarray, dni_codes: np.ndarray, nombres: Sequence[Any], size: int) -> np.ndarray:
+        names = np.empty(size, dtype=object)
+        names[:len(previous)] = previous
+        names[dni_codes] = nombres
+        return names
+
+    def build(self, rows: Dict[str, Sequence[Any]]):
+        """Replace the cube with ``rows``: one sequence per name in COLUMNS."""
+        with self._update_lock:
+            started = time.perf_counter()
+            dictionaries = {dimension: Dictionary() for dimension in DIMENSIONS[1:]}
+            columns = self._encode(rows, dictionaries)
+            names = self._names(np.empty(0, dtype=object), columns["dni"], rows["nombre"], len(dictionaries["dni"]))
+            snapshot = CubeSnapshot(columns, dictionaries, names)
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._snapshot = snapshot
+                self._stats.update(builds=self._stats["builds"] + 1, build_seconds=round(elapsed, 4), built_at=time.time())
+
+    def replace_dates(self, fecha_min: str, fecha_max: str, rows: Dict[str, Sequence[Any]]):
+        """Replace the rows dated fecha_min..fecha_max with ``rows``."""
+        with self._update_lock:
+            started = time.perf_counter()
+            current = self._snapshot
+            if current is None:
+                raise RuntimeError("The cube has not been built")
+            # Dictionaries only grow, so codes in the current snapshot stay valid
+            dictionaries = {dimension: dictionary.copy() for dimension, dictionary in current.dictionaries.items()}
+            fresh = self._encode(rows, dictionaries)
+            fecha = current.columns["fecha"]
+            start = np.searchsorted(fecha, np.int32(to_day(fecha_min)), side="left")
+            end = np.searchsorted(fecha, np.int32(to_day(fecha_max)), side="right")
+            columns = {name: np.concatenate([array[:start], fresh[name], array[end:]]) for name, array in current.columns.items()}
+            names = self._names(current.names, fresh["dni"], rows["nombre"], len(dictionaries["dni"]))
+            snapshot = CubeSnapshot(columns, dictionaries, names)
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._snapshot = snapshot
+                self._stats.update(updates=self._stats["updates"] + 1, update_seconds=round(elapsed, 4))
+
+    def query(
+        self,
+        group_by: Sequence[str] = (),
+        filters: Optional[Dict[str, Any]] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        measures: Optional[Sequence[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Aggregate the measures over the rows matching ``filters`` (dimension ->
+        value or list of values) and the date range, grouped by ``group_by``.
+        Raises ValueError for unknown dimensions or measures.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            raise RuntimeError("The cube has not been built")
+        group_by = list(group_by)
+        measures = list(measures or MEASURES + RATIOS)
+        for name in group_by + list(filters or {}):
+            if name not in DIMENSIONS:
+                raise ValueError(f"Unknown dimension: {name}. Use one of {DIMENSIONS}")
+        for name in measures:
+            if name not in MEASURES + RATIOS:
+                raise ValueError(f"Unknown measure: {name}. Use one of {MEASURES + RATIOS}")
+        with self._lock:
+            self._stats["queries"] += 1
+
+        filters = {
+            dimension: value if isinstance(value, (list, tuple)) else [value]
+            for dimension, value in (filters or {}).items()
+        }
+        if any(not values for values in filters.values()):
+            return []
+        # Narrow to the date slice first; the other filters only scan inside it
+        fecha = snapshot.columns["fecha"]
+        first_day = to_day(date_from) if date_from else None
+        last_day = to_day(date_to) if date_to else None
+        if "fecha" in filters:
+            days = [to_day(value) for value in filters["fecha"]]
+            first_day = max(min(days), first_day) if first_day is not None else min(days)
+            last_day = min(max(days), last_day) if last_day is not None else max(days)
+        # Search with the array's dtype; a Python int makes NumPy cast the whole array
+        start = int(np.searchsorted(fecha, np.int32(first_day), side="left")) if first_day is not None else 0
+        end = int(np.searchsorted(fecha, np.int32(last_day), side="right")) if last_day is not None else snapshot.rows
+        columns = {name: array[start:end] for name, array in snapshot.columns.items()}
+        mask = np.ones(max(end - start, 0), dtype=bool)
+        for dimension, values in filters.items():
+            if dimension == "fecha":
+                if len(values) > 1:
+                    mask &= np.isin(columns["fecha"], np.array(days, dtype=np.int32))
+                continue
+            mask &= np.isin(columns[dimension], snapshot.dictionaries[dimension].lookup(values))
+        selected = np.flatnonzero(mask)
+        if selected.size == 0:
+            return []
+
+        # One int64 key per group, from the dimension codes of each row
+        group_columns = [columns[dimension][selected] for dimension in group_by]
+        if group_columns:
+            offsets = [column.min() for column in group_columns]
+            shape = [int(column.max() - offset) + 1 for column, offset in zip(group_columns, offsets)]
+            keys = np.ravel_multi_index([column - offset for column, offset in zip(group_columns, offsets)], shape)
+            group_keys, inverse = np.unique(keys, return_inverse=True)
+        else:
+            group_keys, inverse = np.zeros(1, dtype=np.int64), np.zeros(selected.size, dtype=np.int64)
+        groups = len(group_keys)
+
+        totals = {}
+        for measure in MEASURES:
+            if measure == "couta":
+                continue
+            totals[measure] = np.bincount(inverse, weights=columns[measure][selected], minlength=groups).astype(np.int64)
+        # couta: max per (group, month, supervisor), then summed per group
+        months = to_month(columns["fecha"][selected])
+        quota_keys = np.ravel_multi_index(
+            [inverse, months - months.min(), columns["supervisor"][selected]],
+            [groups, int(np.ptp(months)) + 1, len(snapshot.dictionaries["supervisor"])]
+        )
+        order = np.lexsort((columns["couta"][selected], quota_keys))
+        last = np.r_[quota_keys[order][1:] != quota_keys[order][:-1], True]
+        top = order[last]
+        totals["couta"] = np.bincount(inverse[top], weights=columns["couta"][selected][top], minlength=groups).astype(np.int64)
+
+        # Decode whole columns at once; building the dicts is the only per-group loop
+        first_rows = selected[np.unique(inverse, return_index=True)[1]]
+        output: Dict[str, List[Any]] = {}
+        for dimension in group_by:
+            codes = columns[dimension][first_rows]
+            if dimension == "fecha":
+                output["fecha"] = [from_day(code) for code in codes.tolist()]
+            else:
+                output[dimension] = [snapshot.dictionaries[dimension].labels[code] for code in codes.tolist()]
+                if dimension == "dni":
+                    output["nombre"] = snapshot.names[codes].tolist()
+        for measure in measures:
+            if measure == "cobertura":
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    ratio = np.round(totals["ventas"] / totals["couta"], 2)
+                output["cobertura"] = [value if couta else None for value, couta in zip(ratio.tolist(), totals["couta"].tolist())]
+            else:
+                output[measure] = totals[measure].tolist()
+        names = list(output)
+        result = [dict(zip(names, values)) for values in zip(*output.values())]
+        # Groups come out in code order; sort them by label, empty labels last
+        result.sort(key=lambda row: tuple((row[dimension] is None, row[dimension] or "") for dimension in group_by))
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        with self._lock:
+            stats = dict(self._stats)
+        if snapshot is None:
+            return {"ready": False, **stats}
+        fechas = snapshot.columns["fecha"]
+        return {
+            "ready": True,
+            "rows": snapshot.rows,
+            "nbytes": snapshot.nbytes(),
+            "fecha_min": from_day(fechas.min()) if snapshot.rows else None,
+            "fecha_max": from_day(fechas.max()) if snapshot.rows else None,
+            "cardinality": {dimension: len(dictionary) for dimension, dictionary in snapshot.dictionaries.items()},
+            **stats,
+        }
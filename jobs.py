@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Job states, in order
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+class QueueFull(Exception):
+    """Raised by ``JobQueue.submit`` when the queue holds ``max_queue`` jobs."""
+
+class JobQueue:
+    """
+    Runs jobs in the background on a bounded asyncio queue.
+
+    ``submit`` stores the job and returns at once; ``workers`` tasks take jobs
+    off the queue, await ``handler(payload)`` with a ``timeout`` and then
+    ``deliver(job)``, which sends the answer wherever it has to go. Finished
+    jobs are kept for ``ttl`` seconds (at most ``max_jobs``) so their status
+    can be polled.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Dict[str, Any]], Awaitable[Any]],
+        deliver: Callable[[Dict[str, Any]], Awaitable[None]],
+        workers: int = 4,
+        max_queue: int = 100,
+        timeout: float = 120,
+        ttl: float = 3600,
+        max_jobs: int = 10000,
+    ):
+        self.handler = handler
+        self.deliver = deliver
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._running = 0
+        self._stats = {"accepted": 0, "rejected": 0, "done": 0, "failed": 0}
+
+    @property
+    def started(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self):
+        """Start the workers; must be called from the event loop."""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [asyncio.create_task(self._work(), name=f"job-worker-{i}") for i in range(self.workers)]
+
+    async def stop(self, drain_timeout: float = 10):
+        """Let the workers finish the queued jobs for up to ``drain_timeout`` seconds, then cancel them."""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Stopping with {self._queue.qsize()} queued jobs")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, payload: Dict[str, Any], **meta: Any) -> Dict[str, Any]:
+        """Queue a job and return its record. ``meta`` is stored on the record (e.g. the callback URL)."""
+        if not self._tasks:
+            raise RuntimeError("The job queue is not running")
+        self._prune()
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "status": QUEUED,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+            **meta,
+        }
+        try:
+            self._queue.put_nowait((job, payload))
+        except asyncio.QueueFull:
+            self._stats["rejected"] += 1
+            raise QueueFull(f"{self.max_queue} jobs are already queued")
+        self._jobs[job["job_id"]] = job
+        self._stats["accepted"] += 1
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._jobs.get(job_id)
+
+    async def _work(self):
+        while True:
+            job, payload = await self._queue.get()
+            self._running += 1
+            try:
+                await self._run(job, payload)
+            finally:
+                self._running -= 1
+                self._queue.task_done()
+
+    async def _run(self, job: Dict[str, Any], payload: Dict[str, Any]):
+        job["status"] = RUNNING
+        job["started_at"] = time.time()
+        try:
+            job["result"] = await asyncio.wait_for(self.handler(payload), self.timeout)
+            job["status"] = DONE
+        except asyncio.TimeoutError:
+            job.update(status=FAILED, error=f"The job did not finish within {self.timeout:g} seconds")
+        except Exception as e:
+            logger.error(f"Job {job['job_id']} failed: {e}")
+            job.update(status=FAILED, error=str(e))
+        job["finished_at"] = time.time()
+        self._stats[job["status"]] += 1
+        try:
+            await self.deliver(job)
+        except Exception as e:
+            logger.error(f"Could not deliver job {job['job_id']}: {e}")
+
+    def _prune(self):
+        """Forget finished jobs older than ``ttl``, and the oldest finished ones beyond ``max_jobs``."""
+        expired = time.time() - self.ttl
+        finished = [job_id for job_id, job in self._jobs.items() if job["finished_at"] is not None]
+        excess = len(self._jobs) - self.max_jobs
+        for job_id in finished:
+            if self._jobs[job_id]["finished_at"] < expired or excess > 0:
+                del self._jobs[job_id]
+                excess -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._tasks),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": self._running,
+            "max_queue": self.max_queue,
+            "tracked": len(self._jobs),
+            **self._stats,
+        }
@@ -0,0 +1,193 @@
+import asyncio
+import collections
+import itertools
+import math
+import time
+from typing import Any, Deque, Dict, Optional
+
+class LimiterRejected(Exception):
+    """The call could not get a slot: the wait queue is full or its deadline passed."""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+class CallLimiter:
+    """
+    Admission control for calls to a rate limited API.
+
+    A call needs a free slot (at most ``max_in_flight`` at once, 0 for no
+    limit) and a token from a bucket refilled at ``rate`` per second up to
+    ``burst`` (``rate`` 0 disables it). Callers wait in FIFO order; at most
+    ``max_waiting`` of them, each for at most ``max_wait`` seconds, so a burst
+    fails fast with LimiterRejected instead of making every call slow. Only
+    used from the event loop thread, so no lock is needed.
+    """
+
+    def __init__(self, max_in_flight: int, rate: float, burst: int, max_waiting: int, max_wait: float):
+        self.max_in_flight = max_in_flight
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait
+        self._in_flight = 0
+        self._tokens = float(self.burst)
+        self._refilled = time.monotonic()
+        self._waiters: Deque[asyncio.Event] = collections.deque()
+        self._stats = {"acquired": 0, "queue_full": 0, "timeout": 0, "waited_seconds": 0.0}
+
+    def _token_delay(self) -> float:
+        """Seconds until a token is available; 0 when one is."""
+        if self.rate <= 0:
+            return 0
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+        return 0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+
+    async def acquire(self, max_wait: Optional[float] = None) -> float:
+        """Wait for a slot and a token; returns the seconds waited. Pair with ``release``."""
+        if self._waiters and len(self._waiters) >= self.max_waiting:
+            self._stats["queue_full"] += 1
+            raise LimiterRejected("queue_full", f"Too many calls waiting for the LLM ({self.max_waiting}); try again later")
+        started = time.monotonic()
+        deadline = started + (self.max_wait if max_wait is None else max_wait)
+        waiter = asyncio.Event()
+        self._waiters.append(waiter)
+        try:
+            while True:
+                delay = None
+                if self._waiters[0] is waiter and (not self.max_in_flight or self._in_flight < self.max_in_flight):
+                    delay = self._token_delay()
+                    if delay == 0:
+                        if self.rate > 0:
+                            self._tokens -= 1
+                        self._in_flight += 1
+                        waited = time.monotonic() - started
+                        self._stats["acquired"] += 1
+                        self._stats["waited_seconds"] += waited
+                        return waited
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeout"] += 1
+                    raise LimiterRejected("timeout", f"No LLM slot became free within {deadline - started:g} seconds; try again later")
+                # Woken by a release or by reaching the head; otherwise by the next token
+                waiter.clear()
+                try:
+                    await asyncio.wait_for(waiter.wait(), remaining if delay is None else min(delay, remaining))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._waiters.remove(waiter)
+            if self._waiters:
+                self._waiters[0].set()
+
+    def try_acquire(self) -> bool:
+        """Take a slot and a token only if both are free now and nobody is waiting."""
+        if self._waiters or (self.max_in_flight and self._in_flight >= self.max_in_flight) or self._token_delay() > 0:
+            return False
+        if self.rate > 0:
+            self._tokens -= 1
+        self._in_flight += 1
+        self._stats["acquired"] += 1
+        return True
+
+    def release(self):
+        self._in_flight -= 1
+        if self._waiters:
+            self._waiters[0].set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self._in_flight,
+            "waiting": len(self._waiters),
+            "max_in_flight": self.max_in_flight,
+            "rate": self.rate,
+            "max_waiting": self.max_waiting,
+            **self._stats,
+        }
+
+class LatencyWindow:
+    """The last ``size`` latencies of successful calls, for percentile estimates."""
+
+    def __init__(self, size: int = 200):
+        self._samples: Deque[float] = collections.deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+class CircuitBreaker:
+    """
+    Stops calling a failing API. After ``failures`` consecutive failures the
+    circuit opens and ``allow`` refuses calls for ``cooldown`` seconds; then
+    one probe call is let through (half open), and its outcome closes or
+    reopens the circuit. ``allow`` returns a ticket for the call, or None;
+    the caller must ``record`` the call's outcome with it, or ``abandon`` it
+    if the call never reached the API. Only the probe's own ticket ends the
+    probe, so a call admitted earlier cannot let a second probe through.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failures: int, cooldown: float):
+        self.failures = failures
+        self.cooldown = cooldown
+        self._consecutive = 0
+        self._opened_at: Optional[float] = None
+        self._probe: Optional[int] = None
+        self._tickets = itertools.count(1)
+        self._stats = {"opened": 0, "rejected": 0}
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if self._probe is not None or time.monotonic() - self._opened_at >= self.cooldown:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self) -> Optional[int]:
+        state = self.state
+        if state == self.CLOSED:
+            return next(self._tickets)
+        if state == self.HALF_OPEN and self._probe is None:
+            self._probe = next(self._tickets)
+            return self._probe
+        self._stats["rejected"] += 1
+        return None
+
+    def record(self, ticket: int, ok: bool):
+        if ticket == self._probe:
+            self._probe = None
+        if ok:
+            self._consecutive = 0
+            self._opened_at = None
+            self._probe = None
+            return
+        self._consecutive += 1
+        if self._opened_at is not None or self._consecutive >= self.failures:
+            if self._opened_at is None:
+                self._stats["opened"] += 1
+            self._opened_at = time.monotonic()
+
+    def abandon(self, ticket: int):
+        if ticket == self._probe:
+            self._probe = None
+
+    def retry_in(self) -> float:
+        """Seconds until the next probe is allowed; 0 when calls are allowed now."""
+        if self._opened_at is None:
+            return 0
+        return max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"state": self.state, "consecutive_failures": self._consecutive, **self._stats}
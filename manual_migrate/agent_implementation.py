@@ -2,13 +2,20 @@ import json
 import aiohttp
 import logging
 import os
-from fastapi import FastAPI
+import sys
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from pydantic import BaseModel
 from dotenv import load_dotenv
-from typing import Any, List, Dict
+from typing import Any, List, Dict, Optional
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+# limiter.py and metrics.py live next to app.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from limiter import CallLimiter  # noqa: E402
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY as METRICS, Histogram  # noqa: E402
+
 # Load environment variables
 load_dotenv()
 
@@ -21,6 +28,21 @@ BACKEND_SERVER = os.getenv("SERVER_URL", "http://localhost:8000")
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY") #, "your-api-key-here"
 DEEPSEEK_API_URL = os.getenv("DEEPSEEK_API_URL", "https://api.deepseek.com/v1/chat/completions")
 
+# LLM HTTP client configuration
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "120"))
+
+# DeepSeek admission control, same settings as app.py: calls in flight and
+# per second (0 = no limit) with bursts of LLM_RATE_BURST, and how many may
+# wait and for how long
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))
+LLM_RATE_LIMIT = float(os.getenv("LLM_RATE_LIMIT", "0"))
+LLM_RATE_BURST = int(os.getenv("LLM_RATE_BURST", str(max(1, LLM_MAX_IN_FLIGHT))))
+LLM_MAX_WAITING = int(os.getenv("LLM_MAX_WAITING", "100"))
+LLM_MAX_WAIT = float(os.getenv("LLM_MAX_WAIT", "10"))
+
 # Database configuration
 DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_NAME = os.getenv("DB_NAME", "postgres")
@@ -28,8 +50,58 @@ DB_USER = os.getenv("DB_USER", "postgres")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "localpassword")
 DB_PORT = int(os.getenv("DB_PORT", "5432"))
 
+# Shared aiohttp session so DeepSeek calls reuse keep-alive connections.
+# aiohttp only speaks HTTP/1.1, so keep-alive is what saves the TLS setup here.
+http_session: Optional[aiohttp.ClientSession] = None
+
+def get_http_session() -> aiohttp.ClientSession:
+    """
+    Return the shared DeepSeek session, creating it on first use.
+    """
+    global http_session
+    if http_session is None or http_session.closed:
+        http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=LLM_MAX_CONNECTIONS,
+                keepalive_timeout=LLM_KEEPALIVE_EXPIRY,
+                ttl_dns_cache=300
+            ),
+            timeout=aiohttp.ClientTimeout(total=LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+            headers={
+                "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
+                "Content-Type": "application/json"
+            }
+        )
+    return http_session
+
+llm_limiter = CallLimiter(LLM_MAX_IN_FLIGHT, LLM_RATE_LIMIT, LLM_RATE_BURST, LLM_MAX_WAITING, LLM_MAX_WAIT)
+LLM_QUEUE_SECONDS = Histogram("agent_llm_queue_seconds", "Time DeepSeek calls waited for the limiter before being sent", ["call"])
+
+@asynccontextmanager
+async def llm_slot(call: str):
+    """
+    Hold a limiter slot for one DeepSeek call (``call`` labels the wait
+    metric); raises LimiterRejected when none frees up in time.
+    """
+    waited = await llm_limiter.acquire()
+    LLM_QUEUE_SECONDS.labels(call).observe(waited)
+    try:
+        yield
+    finally:
+        llm_limiter.release()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Open the shared HTTP session at startup and close it at shutdown.
+    """
+    get_http_session()
+    yield
+    if http_session is not None:
+        await http_session.close()
+
 # Create FastAPI app
-app = FastAPI(servers=[{"url": BACKEND_SERVER}])
+app = FastAPI(servers=[{"url": BACKEND_SERVER}], lifespan=lifespan)
 
 def get_schema() -> str:
     """
@@ -213,21 +285,14 @@ async def human_query_to_sql(human_query: str) -> str:
         "response_format": {"type": "json_object"}
     }
 
-    headers = {
-        "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                DEEPSEEK_API_URL,
-                headers=headers,
-                json=payload
-            ) as response:
-                response.raise_for_status()
-                response_data = await response.json()
-                return response_data['choices'][0]['message']['content']
+        async with llm_slot("sql"), get_http_session().post(
+            DEEPSEEK_API_URL,
+            json=payload
+        ) as response:
+            response.raise_for_status()
+            response_data = await response.json()
+            return response_data['choices'][0]['message']['content']
     except Exception as e:
         logger.error(f"Error calling DeepSeek API for SQL conversion: {e}")
         return json.dumps({
@@ -259,25 +324,23 @@ async def build_answer(result: List[Dict[str, Any]], human_query: str) -> str:
         "temperature": 0.7
     }
 
-    headers = {
-        "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                DEEPSEEK_API_URL,
-                headers=headers,
-                json=payload
-            ) as response:
-                response.raise_for_status()
-                response_data = await response.json()
-                return response_data['choices'][0]['message']['content']
+        async with llm_slot("answer"), get_http_session().post(
+            DEEPSEEK_API_URL,
+            json=payload
+        ) as response:
+            response.raise_for_status()
+            response_data = await response.json()
+            return response_data['choices'][0]['message']['content']
     except Exception as e:
         logger.error(f"Error calling DeepSeek API for natural language response: {e}")
         return f"Error generating natural language response: {str(e)}"
 
+@app.get("/metrics")
+async def get_metrics():
+    """Limiter wait times in Prometheus text format."""
+    return Response(METRICS.render(), media_type=METRICS_CONTENT_TYPE)
+
 class PostHumanQueryPayload(BaseModel):
     human_query: str
 
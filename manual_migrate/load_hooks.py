@@ -0,0 +1,349 @@
+import calendar
+import json
+import logging
+from datetime import date, datetime
+
+import pandas as pd
+from sqlalchemy import text
+
+# Tabla con un contador de versión por tabla cargada. La API (app.py) la
+# consulta para saber cuándo sus cachés de resultados dejaron de ser válidos.
+VERSION_TABLE = "etl_data_version"
+
+# Canal de LISTEN/NOTIFY que escucha la API para invalidar solo lo afectado
+NOTIFY_CHANNEL = "etl_data_changed"
+
+# Clave del advisory lock que serializa las publicaciones: dos loaders que
+# publican a la vez borrarían e insertarían las mismas fechas de las tablas
+# derivadas y dejarían filas duplicadas
+PUBLISH_LOCK_ID = 7301544
+
+# Versión materializada de vista_actividad_usuarios (notes/sql_07_05_2025.sql):
+# una fila por vendedor y día, refrescada solo para las fechas que toca cada carga
+FACT_TABLE = "actividad_diaria"
+FACT_SOURCES = ('actividades', 'cuotas', 'usuarios')
+# Mismo calendario que la vista
+CALENDARIO_INICIO = date(2025, 1, 1)
+CALENDARIO_FIN = date(2025, 12, 31)
+
+FACT_DDL = f"""
+CREATE TABLE IF NOT EXISTS {FACT_TABLE} (
+    fecha DATE NOT NULL,
+    dni VARCHAR(8) NOT NULL,
+    nombre VARCHAR(255),
+    zonal VARCHAR(100),
+    supervisor VARCHAR(255),
+    estado VARCHAR(100),
+    rol VARCHAR(255),
+    hc INT NOT NULL DEFAULT 1,
+    login INT NOT NULL DEFAULT 0,
+    asisth INT NOT NULL DEFAULT 0,
+    hc_c_vta INT NOT NULL DEFAULT 0,
+    ventas BIGINT NOT NULL DEFAULT 0,  -- BIGINT como el COUNT de la vista: SUM(ventas) es NUMERIC y no divide como entero
+    couta INT NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_{FACT_TABLE}_fecha_supervisor ON {FACT_TABLE} (fecha, zonal, supervisor);
+CREATE INDEX IF NOT EXISTS ix_{FACT_TABLE}_fecha_dni ON {FACT_TABLE} (fecha, dni);
+"""
+
+# Mismo cálculo que la vista, limitado a [:fecha_min, :fecha_max]. Las
+# actividades se agregan por vendedor y día antes del cruce, y la cuota
+# vigente de cada mes (la de MAX(fecha)) se calcula una vez por supervisor en
+# lugar de con una subconsulta por fila. El padrón es el de la última carga
+# de usuarios (MAX(fecha_proceso)) y no el de CURRENT_DATE como en la vista,
+# para que el resultado no dependa del día ni de la hora en que se recalcula.
+ROSTER_FECHA_SQL = "(SELECT MAX(fecha_proceso) FROM usuarios)"
+
+FACT_REFRESH_SQL = f"""
+INSERT INTO {FACT_TABLE} (fecha, dni, nombre, zonal, supervisor, estado, rol, hc, login, asisth, hc_c_vta, ventas, couta)
+WITH
+  Calendar AS (
+    SELECT generate_series(CAST(:fecha_min AS date), CAST(:fecha_max AS date), '1 day')::date AS fecha
+  ),
+
+  UsuariosAjustados AS (
+    SELECT
+      LEFT(u.usuario, 8) AS dni,
+      u.nombre,
+      CASE
+        WHEN u.dni IN ('41455870','42047009','46862391','48306579','70258803','72807335','75947227')
+          THEN 'GOMEZ PALZA CAROLINA MERCEDES'
+        ELSE u.superior
+      END AS superior_ajustado,
+      CASE
+        WHEN u.superior = 'GOMEZ PALZA CAROLINA MERCEDES'
+          THEN 'ILO'
+        ELSE u.zonal
+      END AS zonal_ajustado,
+      u.estado,
+      regexp_replace(u.rol, '^.* - ', '') AS rol
+    FROM usuarios u
+    WHERE
+      u.rol ILIKE '%vendedor%'
+      AND u.estado = 'En campo'
+      AND u.fecha_proceso = {ROSTER_FECHA_SQL}
+      AND u.nombre NOT ILIKE ANY (ARRAY[
+        'BECERRA ACHATA SERGIO RENATO',
+        'PAIVA ZARATE ALDO WILLIAMS'
+      ])
+      AND u.superior NOT ILIKE 'PAIVA ZARATE ALDO WILLIAMS'
+  ),
+
+  ActividadDia AS (
+    SELECT
+      a.dni_vendedor,
+      a.fecha::date AS fecha,
+      MAX(CASE WHEN a.actividad = 'LOGIN' THEN 1 ELSE 0 END) AS login,
+      MAX(CASE WHEN a.actividad = 'PRESENCIA HUELLERO' THEN 1 ELSE 0 END) AS asisth,
+      MAX(CASE WHEN a.detalle = 'VENTA FIJA' THEN 1 ELSE 0 END) AS hc_c_vta,
+      COUNT(CASE WHEN a.detalle = 'VENTA FIJA' THEN 1 END) AS ventas
+    FROM actividades a
+    WHERE a.fecha >= CAST(:fecha_min AS date) AND a.fecha < CAST(:fecha_max AS date) + 1
+    GROUP BY a.dni_vendedor, a.fecha::date
+  ),
+
+  CuotaMes AS (
+    -- Si hay varias cuotas en la última fecha del mes se toma la mayor
+    SELECT DISTINCT ON (q.supervisor, date_trunc('month', q.fecha))
+      q.supervisor,
+      date_trunc('month', q.fecha)::date AS mes,
+      q.valor
+    FROM cuotas q
+    WHERE
+      q.fecha >= date_trunc('month', CAST(:fecha_min AS date))
+      AND q.fecha < date_trunc('month', CAST(:fecha_max AS date)) + interval '1 month'
+    ORDER BY q.supervisor, date_trunc('month', q.fecha), q.fecha DESC, q.valor DESC
+  )
+
+SELECT
+  c.fecha,
+  ua.dni,
+  ua.nombre,
+  ua.zonal_ajustado,
+  ua.superior_ajustado,
+  ua.estado,
+  ua.rol,
+  1,
+  COALESCE(ad.login, 0),
+  COALESCE(ad.asisth, 0),
+  COALESCE(ad.hc_c_vta, 0),
+  COALESCE(ad.ventas, 0),
+  COALESCE(cm.valor, 0)
+FROM Calendar c
+CROSS JOIN UsuariosAjustados ua
+LEFT JOIN ActividadDia ad
+  ON ad.dni_vendedor = ltrim(ua.dni, '0')
+  AND ad.fecha = c.fecha
+LEFT JOIN CuotaMes cm
+  ON cm.supervisor = ua.superior_ajustado
+  AND cm.mes = date_trunc('month', c.fecha)::date
+"""
+
+# Resúmenes diarios de los dos reportes de cobertura, calculados desde
+# actividad_diaria con las mismas agregaciones que las consultas de ejemplo
+RESUMEN_SUPERVISOR = "resumen_supervisor_diario"
+RESUMEN_ZONAL = "resumen_zonal_diario"
+
+RESUMEN_SUPERVISOR_DDL = f"""
+CREATE TABLE IF NOT EXISTS {RESUMEN_SUPERVISOR} (
+    fecha DATE NOT NULL,
+    zonal VARCHAR(100),
+    supervisor VARCHAR(255),
+    total_hc INT NOT NULL,
+    total_login INT NOT NULL,
+    total_asisth INT NOT NULL,
+    total_hc_c_vta INT NOT NULL,
+    total_ventas NUMERIC NOT NULL,
+    couta INT NOT NULL,
+    cobertura NUMERIC(12, 2)
+);
+CREATE INDEX IF NOT EXISTS ix_{RESUMEN_SUPERVISOR}_fecha ON {RESUMEN_SUPERVISOR} (fecha, zonal, supervisor);
+"""
+
+RESUMEN_SUPERVISOR_REFRESH_SQL = f"""
+INSERT INTO {RESUMEN_SUPERVISOR} (fecha, zonal, supervisor, total_hc, total_login, total_asisth, total_hc_c_vta, total_ventas, couta, cobertura)
+SELECT
+  ad.fecha,
+  ad.zonal,
+  ad.supervisor,
+  SUM(ad.hc),
+  SUM(ad.login),
+  SUM(ad.asisth),
+  SUM(ad.hc_c_vta),
+  SUM(ad.ventas),
+  MAX(ad.couta),
+  ROUND(SUM(ad.ventas) / NULLIF(MAX(ad.couta), 0), 2)
+FROM {FACT_TABLE} ad
+WHERE ad.fecha BETWEEN :fecha_min AND :fecha_max
+GROUP BY ad.fecha, ad.zonal, ad.supervisor
+"""
+
+RESUMEN_ZONAL_DDL = f"""
+CREATE TABLE IF NOT EXISTS {RESUMEN_ZONAL} (
+    fecha DATE NOT NULL,
+    zonal VARCHAR(100),
+    ventas NUMERIC NOT NULL,
+    couta INT NOT NULL,
+    cobertura NUMERIC(12, 2)
+);
+CREATE INDEX IF NOT EXISTS ix_{RESUMEN_ZONAL}_fecha ON {RESUMEN_ZONAL} (fecha, zonal);
+"""
+
+# La cuota zonal suma la cuota máxima de cada supervisor
+RESUMEN_ZONAL_REFRESH_SQL = f"""
+INSERT INTO {RESUMEN_ZONAL} (fecha, zonal, ventas, couta, cobertura)
+SELECT
+  rs.fecha,
+  rs.zonal,
+  SUM(rs.total_ventas),
+  SUM(rs.couta),
+  ROUND(SUM(rs.total_ventas) / NULLIF(SUM(rs.couta), 0), 2)
+FROM {RESUMEN_SUPERVISOR} rs
+WHERE rs.fecha BETWEEN :fecha_min AND :fecha_max
+GROUP BY rs.fecha, rs.zonal
+"""
+
+# Tablas derivadas, en orden de cálculo
+DERIVED_TABLES = [
+    (FACT_TABLE, FACT_DDL, FACT_REFRESH_SQL),
+    (RESUMEN_SUPERVISOR, RESUMEN_SUPERVISOR_DDL, RESUMEN_SUPERVISOR_REFRESH_SQL),
+    (RESUMEN_ZONAL, RESUMEN_ZONAL_DDL, RESUMEN_ZONAL_REFRESH_SQL),
+]
+
+def ensure_version_table(conn):
+    """Crea la tabla de versiones si no existe"""
+    conn.execute(text(f"""
+    CREATE TABLE IF NOT EXISTS {VERSION_TABLE} (
+        table_name VARCHAR(100) PRIMARY KEY,
+        version BIGINT NOT NULL DEFAULT 0,
+        fecha_min DATE,
+        fecha_max DATE,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """))
+
+def fecha_range(values):
+    """Devuelve (fecha_min, fecha_max) de una serie o lista de fechas, ignorando nulos"""
+    fechas = pd.to_datetime(pd.Series(list(values)), errors='coerce').dropna()
+    if fechas.empty:
+        return None, None
+    return fechas.min().date(), fechas.max().date()
+
+def _as_date(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return pd.to_datetime(value).date()
+
+def affected_range(table_name, fecha_min, fecha_max):
+    """
+    Convierte las fechas cargadas en el rango de fechas de reporte afectado,
+    según cómo vista_actividad_usuarios usa cada tabla. (None, None) indica
+    que puede cambiar cualquier fecha.
+    """
+    if fecha_min is None or fecha_max is None:
+        return None, None
+    if table_name == 'usuarios':
+        # La vista cruza el padrón vigente con todo el calendario
+        return None, None
+    if table_name == 'cuotas':
+        # La cuota de un día se aplica a todo su mes (MAX(fecha) del mes)
+        ultimo_dia = calendar.monthrange(fecha_max.year, fecha_max.month)[1]
+        return fecha_min.replace(day=1), fecha_max.replace(day=ultimo_dia)
+    return fecha_min, fecha_max
+
+def roster_size(conn):
+    """Vendedores en campo del último padrón cargado (0 si aún no hay usuarios)"""
+    if not conn.execute(text("SELECT to_regclass('usuarios') IS NOT NULL")).scalar():
+        return 0
+    return conn.execute(text(f"""
+        SELECT COUNT(*) FROM usuarios u
+        WHERE u.fecha_proceso = {ROSTER_FECHA_SQL} AND u.rol ILIKE '%vendedor%' AND u.estado = 'En campo'
+    """)).scalar()
+
+def refresh_derived_tables(conn, fecha_min=None, fecha_max=None):
+    """
+    Recalcula actividad_diaria y sus resúmenes para [fecha_min, fecha_max],
+    recortado al calendario; sin rango recalcula todo el calendario. Si
+    falta alguna de las tablas se crea y se llenan completas. Devuelve el
+    rango recalculado ((None, None) si fue todo el calendario), o None si no
+    había nada que recalcular. Sin padrón de vendedores no se recalcula nada,
+    para no vaciar las fechas ya calculadas.
+    """
+    faltan = any(
+        not conn.execute(text("SELECT to_regclass(:tabla) IS NOT NULL"), {"tabla": tabla}).scalar()
+        for tabla, _, _ in DERIVED_TABLES
+    )
+    for _, ddl, _ in DERIVED_TABLES:
+        conn.execute(text(ddl))
+    if not roster_size(conn):
+        logging.warning("Sin padrón de vendedores en usuarios: no se recalculan las tablas derivadas")
+        return None
+    if faltan or fecha_min is None or fecha_max is None:
+        fecha_min, fecha_max = CALENDARIO_INICIO, CALENDARIO_FIN
+    fecha_min, fecha_max = max(fecha_min, CALENDARIO_INICIO), min(fecha_max, CALENDARIO_FIN)
+    if fecha_min > fecha_max:
+        return None
+    params = {"fecha_min": fecha_min, "fecha_max": fecha_max}
+    for tabla, _, refresh_sql in DERIVED_TABLES:
+        conn.execute(text(f"DELETE FROM {tabla} WHERE fecha BETWEEN :fecha_min AND :fecha_max"), params)
+        filas = conn.execute(text(refresh_sql), params).rowcount
+        logging.info(f"{tabla} recalculada del {fecha_min} al {fecha_max}: {filas} filas")
+    if (fecha_min, fecha_max) == (CALENDARIO_INICIO, CALENDARIO_FIN):
+        return None, None
+    return fecha_min, fecha_max
+
+def _bump_version(conn, table_name, fecha_min, fecha_max):
+    """Incrementa la versión de la tabla y encola su NOTIFY en la transacción actual"""
+    version = conn.execute(text(f"""
+        INSERT INTO {VERSION_TABLE} (table_name, version, fecha_min, fecha_max, updated_at)
+        VALUES (:table_name, 1, :fecha_min, :fecha_max, CURRENT_TIMESTAMP)
+        ON CONFLICT (table_name) DO UPDATE SET
+            version = {VERSION_TABLE}.version + 1,
+            fecha_min = EXCLUDED.fecha_min,
+            fecha_max = EXCLUDED.fecha_max,
+            updated_at = CURRENT_TIMESTAMP
+        RETURNING version
+        """), {"table_name": table_name, "fecha_min": fecha_min, "fecha_max": fecha_max}).scalar()
+    payload = json.dumps({
+        "table": table_name,
+        "version": version,
+        "fecha_min": fecha_min.isoformat() if fecha_min else None,
+        "fecha_max": fecha_max.isoformat() if fecha_max else None
+    })
+    conn.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": NOTIFY_CHANNEL, "payload": payload})
+    logging.info(f"Carga publicada: {table_name} v{version} ({fecha_min} a {fecha_max})")
+    return version
+
+def publish_load(engine, table_name, fecha_min=None, fecha_max=None):
+    """
+    Registra que un loader confirmó cambios en ``table_name`` para el rango
+    de fechas indicado: incrementa su versión y envía un NOTIFY con la tabla,
+    la versión y el rango de fechas afectado. Si la tabla alimenta
+    actividad_diaria, recalcula esa tabla y los resúmenes de supervisor y
+    zonal para ese rango y publica también sus versiones. Todo va en una
+    transacción, así que los NOTIFY se entregan al hacer commit, junto con
+    los datos recalculados. Las publicaciones se hacen de a una
+    (PUBLISH_LOCK_ID); la siguiente espera el commit de la anterior.
+
+    Se llama después del commit de la carga; si falla solo se registra el
+    error, porque los datos ya quedaron guardados.
+    """
+    fecha_min, fecha_max = affected_range(table_name, _as_date(fecha_min), _as_date(fecha_max))
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:lock_id)"), {"lock_id": PUBLISH_LOCK_ID})
+            ensure_version_table(conn)
+            version = _bump_version(conn, table_name, fecha_min, fecha_max)
+            if table_name in FACT_SOURCES:
+                recalculado = refresh_derived_tables(conn, fecha_min, fecha_max)
+                if recalculado is not None:
+                    for tabla, _, _ in DERIVED_TABLES:
+                        _bump_version(conn, tabla, *recalculado)
+        return version
+    except Exception as e:
+        logging.error(f"No se pudo publicar la carga de {table_name}: {e}")
+        return None
@@ -6,6 +6,7 @@ import hashlib
 import sys
 from sqlalchemy import create_engine, text, inspect
 import traceback
+from load_hooks import publish_load, fecha_range
 
 # Configuración de logging
 logging.basicConfig(
@@ -296,6 +297,7 @@ def incremental_load_and_update(df, engine):
             insert_df = df[required_cols]
             insert_df.to_sql('actividades', engine, if_exists='append', 
                           index=False, chunksize=500, method='multi')
+            publish_load(engine, 'actividades', *fecha_range(insert_df['fecha']))
             return len(df), 0
         
         # Crear mapa de hash para búsqueda rápida
@@ -407,6 +409,12 @@ def incremental_load_and_update(df, engine):
             
             logging.info(f"Registros actualizados con cambios: {updated_count}")
         
+        # Avisar a la API qué fechas de actividades cambiaron
+        if inserted_count or updated_count:
+            fechas_cambiadas = list(new_records_df['fecha'])
+            fechas_cambiadas += [row['fecha'] for row in records_to_update] if updated_count else []
+            publish_load(engine, 'actividades', *fecha_range(fechas_cambiadas))
+        
         return inserted_count, updated_count
 
     except Exception as e:
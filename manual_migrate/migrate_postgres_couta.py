@@ -5,6 +5,7 @@ import logging
 from sqlalchemy import create_engine, text
 import hashlib
 import psycopg2
+from load_hooks import publish_load, fecha_range
 
 # Configuración de logging
 logging.basicConfig(
@@ -209,6 +210,9 @@ def incremental_load(df, engine):
         
         records_inserted = len(new_records)
         logging.info(f"Se insertaron {records_inserted} nuevos registros")
+        
+        # Avisar a la API que las cuotas de estas fechas cambiaron
+        publish_load(engine, 'cuotas', *fecha_range(new_records['fecha']))
         print(f"Se insertaron {records_inserted} nuevos registros")
         return records_inserted
     except Exception as e:
@@ -245,6 +249,7 @@ def update_existing_records(df, engine):
             if key in existing_records and existing_records[key]['hash'] != row['hash_datos']:
                 updates.append({
                     'id': existing_records[key]['id'],
+                    'fecha': row['fecha'],
                     'valor': row['valor'],
                     'hash': row['hash_datos']
                 })
@@ -270,6 +275,9 @@ def update_existing_records(df, engine):
                     ))
                     updated_count += 1
                 conn.commit()
+            
+            # Avisar a la API que las cuotas de estas fechas cambiaron
+            publish_load(engine, 'cuotas', *fecha_range(update['fecha'] for update in updates))
         
         if updated_count > 0:
             logging.info(f"Se actualizaron {updated_count} registros existentes")
@@ -6,6 +6,7 @@ from datetime import datetime
 from sqlalchemy import create_engine, text, inspect
 import numpy as np
 import sys
+from load_hooks import publish_load, fecha_range
 
 # Función para cargar la configuración desde YAML
 def cargar_configuracion(archivo_config=r"manual_migrate\config_detallado.yml"):
@@ -500,6 +501,10 @@ def procesar_carga_incremental(engine, df):
         
         logger.info(f"Se actualizaron {registros_actualizados} registros existentes")
         
+        # Avisar a la API qué fechas del detallado cambiaron
+        if nuevos_insertados or registros_actualizados:
+            publish_load(engine, TABLA_DESTINO, *fecha_range(row['fecha'] for row in nuevos + actualizar))
+        
         return {
             'nuevos': nuevos_insertados,
             'actualizados': registros_actualizados,
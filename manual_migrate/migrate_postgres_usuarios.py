@@ -10,6 +10,7 @@ import re
 import unicodedata
 from sqlalchemy import create_engine, text, inspect
 import phonenumbers
+from load_hooks import publish_load
 
 
 def setup_logging(config):
@@ -489,6 +490,7 @@ def incremental_load_and_update(df, engine, config, key_fields):
             # No hay registros existentes para esta fecha, insertar todos
             logging.info(f"No hay registros existentes para {fecha_proceso}. Insertando todos como nuevos.")
             db_df.to_sql(table_name, engine, if_exists='append', index=False, chunksize=500)
+            publish_load(engine, table_name, fecha_proceso, fecha_proceso)
             return len(db_df), 0
         
         # Crear hashmap de registros existentes
@@ -570,6 +572,10 @@ def incremental_load_and_update(df, engine, config, key_fields):
                 
                 logging.info(f"Actualizados {updated_count} registros con cambios")
         
+        # Avisar a la API que cambió el padrón de usuarios de esta fecha de proceso
+        if inserted_count or updated_count:
+            publish_load(engine, table_name, fecha_proceso, fecha_proceso)
+        
         return inserted_count, updated_count
         
     except Exception as e:
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+# The service modules live in the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+@pytest.fixture(scope="session")
+def db_pool():
+    """app's connection pool, opened against DB_HOST; tests that need it are skipped without PostgreSQL."""
+    import app
+
+    try:
+        app.db_pool.open()
+        app.db_pool.release(app.db_pool.acquire())
+    except Exception as e:
+        pytest.skip(f"PostgreSQL is not reachable: {e}")
+    yield app.db_pool
+    app.db_pool.close()
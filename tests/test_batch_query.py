@@ -0,0 +1,92 @@
+import asyncio
+import json
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+
+import app
+from app import BatchQueryItem, BatchQueryRequest
+
+class Backend:
+    """Stands in for translate_query and run_sql_query; translating a question takes 20 ms."""
+
+    def __init__(self):
+        self.translating = 0
+        self.most_translating = 0
+        self.dates = {}
+        self.forgotten = []
+
+    async def translate(self, query, date):
+        self.translating += 1
+        self.most_translating = max(self.most_translating, self.translating)
+        self.dates[query] = date
+        await asyncio.sleep(0.02)
+        self.translating -= 1
+        if query == "hola":
+            return {"error": "Not a question about the data", "sql": ""}
+        if query == "boom":
+            raise RuntimeError("translation crashed")
+        return {"error": None, "sql": f"SELECT '{query}'", "cache_key": query}
+
+    async def run(self, sql_query):
+        if "rota" in sql_query:
+            return {"error": "relation does not exist", "results": []}
+        return {"error": None, "results": [{"pregunta": sql_query, "cobertura": Decimal("0.85")}]}
+
+@pytest.fixture
+def backend(monkeypatch):
+    backend = Backend()
+    monkeypatch.setattr(app, "translate_query", backend.translate)
+    monkeypatch.setattr(app, "run_sql_query", backend.run)
+    monkeypatch.setattr(app, "forget_translation", backend.forgotten.append)
+    monkeypatch.setattr(app, "BATCH_TRANSLATION_CONCURRENCY", 2)
+    return backend
+
+def batch(*queries, date=None):
+    items = [BatchQueryItem(**query) if isinstance(query, dict) else BatchQueryItem(human_query=query) for query in queries]
+    response = asyncio.run(app.process_batch_query(BatchQueryRequest(queries=items, date=date)))
+    return json.loads(response.body)
+
+def test_results_keep_the_order_of_the_request(backend):
+    body = batch("supervisores", "zonales", "vendedores")
+    assert [result["original_query"] for result in body["results"]] == ["supervisores", "zonales", "vendedores"]
+    assert body["results"][1] == {
+        "original_query": "zonales",
+        "sql_query": "SELECT 'zonales'",
+        "result": [{"pregunta": "SELECT 'zonales'", "cobertura": "0.85"}],
+        "error": None,
+        "next_page_token": None,
+    }
+    assert body["errors"] == 0
+
+def test_translations_run_concurrently_up_to_the_limit(backend):
+    body = batch(*(f"pregunta {n}" for n in range(6)))
+    assert backend.most_translating == 2
+    # Three rounds of 20 ms, not six
+    assert body["elapsed_ms"] < 110
+
+def test_each_item_carries_its_own_error(backend):
+    body = batch("zonales", "hola", "tabla rota", "boom")
+    errors = [result["error"] for result in body["results"]]
+    assert errors == [None, "Not a question about the data", "relation does not exist", "translation crashed"]
+    assert body["errors"] == 3
+    assert body["results"][2]["sql_query"] == "SELECT 'tabla rota'"
+    # SQL that failed is not served from the translation cache again
+    assert [sql_response["cache_key"] for sql_response in backend.forgotten] == ["tabla rota"]
+
+def test_items_default_to_the_batch_date_and_format(backend):
+    body = batch("zonales", {"human_query": "vendedores", "date": "2025-05-07", "format": "columnar"}, date="2025-05-06")
+    assert backend.dates == {"zonales": "2025-05-06", "vendedores": "2025-05-07"}
+    assert body["results"][1]["result"] == {"pregunta": ["SELECT 'vendedores'"], "cobertura": ["0.85"]}
+
+@pytest.mark.parametrize("queries", [
+    [],
+    [{"human_query": "zonales", "format": "arrow"}],
+    [{"human_query": "zonales", "format": "xml"}],
+    [{"human_query": "zonales"}] * (app.MAX_BATCH_SIZE + 1),
+])
+def test_invalid_batches_are_rejected(backend, queries):
+    with pytest.raises(HTTPException) as rejected:
+        batch(*queries)
+    assert rejected.value.status_code == 400
@@ -0,0 +1,76 @@
+import asyncio
+import json
+
+import pytest
+
+from brokers import Broker, BrokerError, BrokerTimeout, LocalBroker
+
+def dumps(value):
+    return json.dumps(value).encode()
+
+async def serving(broker, handler, prefetch=2):
+    await broker.start()
+    return asyncio.create_task(broker.serve(handler, prefetch))
+
+def test_call_returns_the_worker_result():
+    async def handler(payload):
+        return {"rows": payload["n"] * 2}
+
+    async def main():
+        broker = LocalBroker(dumps)
+        worker = await serving(broker, handler)
+        results = await asyncio.gather(*(broker.call({"n": n}, timeout=1) for n in range(5)))
+        worker.cancel()
+        return broker, results
+
+    broker, results = asyncio.run(main())
+    assert results == [{"rows": n * 2} for n in range(5)]
+    stats = broker.stats()
+    assert (stats["calls"], stats["served"], stats["waiting"], stats["queued"]) == (5, 5, 0, 0)
+
+def test_failed_jobs_raise_broker_error():
+    async def handler(payload):
+        raise ValueError("relation does not exist")
+
+    async def main():
+        broker = LocalBroker(dumps)
+        worker = await serving(broker, handler)
+        try:
+            with pytest.raises(BrokerError, match="relation does not exist"):
+                await broker.call({}, timeout=1)
+        finally:
+            worker.cancel()
+        return broker
+
+    assert asyncio.run(main()).stats()["errors"] == 1
+
+def test_calls_time_out_and_late_replies_are_dropped():
+    async def handler(payload):
+        await asyncio.sleep(0.1)
+        return "late"
+
+    async def main():
+        broker = LocalBroker(dumps)
+        worker = await serving(broker, handler)
+        with pytest.raises(BrokerTimeout):
+            await broker.call({}, timeout=0.02)
+        await asyncio.sleep(0.15)
+        worker.cancel()
+        return broker
+
+    stats = asyncio.run(main()).stats()
+    assert (stats["timeouts"], stats["late_replies"], stats["waiting"]) == (1, 1, 0)
+
+def test_publish_failures_raise_broker_error():
+    async def main():
+        broker = LocalBroker(dumps)  # never started, so there is no queue to publish to
+        with pytest.raises(BrokerError, match="Could not publish"):
+            await broker.call({}, timeout=1)
+        return broker
+
+    stats = asyncio.run(main()).stats()
+    assert (stats["publish_errors"], stats["waiting"]) == (1, 0)
+
+def test_broker_is_abstract():
+    with pytest.raises(TypeError):
+        Broker(dumps)
@@ -0,0 +1,73 @@
+import pytest
+
+from cube import SalesCube
+
+def make_rows(records):
+    """Rows in the column layout SalesCube.build takes, from (fecha, zonal, supervisor, dni, ventas, couta) tuples."""
+    rows = {name: [] for name in ("fecha", "zonal", "supervisor", "dni", "nombre", "hc", "login", "asisth", "hc_c_vta", "ventas", "couta")}
+    for fecha, zonal, supervisor, dni, ventas, couta in records:
+        for name, value in (
+            ("fecha", fecha), ("zonal", zonal), ("supervisor", supervisor), ("dni", dni), ("nombre", f"VENDEDOR {dni}"),
+            ("hc", 1), ("login", 1), ("asisth", 0), ("hc_c_vta", int(ventas > 0)), ("ventas", ventas), ("couta", couta),
+        ):
+            rows[name].append(value)
+    return rows
+
+RECORDS = [
+    ("2025-05-01", "ILO", "S1", "1", 2, 30),
+    ("2025-05-01", "ILO", "S1", "2", 1, 30),
+    ("2025-05-01", "ILO", "S2", "3", 0, 20),
+    ("2025-05-02", "ILO", "S1", "1", 3, 30),
+    ("2025-05-02", "ILO", "S2", "3", 4, 20),
+    ("2025-05-02", "TACNA", "S3", "4", 5, 50),
+    ("2025-06-01", "ILO", "S1", "1", 6, 40),
+]
+
+@pytest.fixture
+def cube():
+    cube = SalesCube()
+    cube.build(make_rows(RECORDS))
+    return cube
+
+def test_group_by_one_day_matches_the_supervisor_report(cube):
+    result = cube.query(group_by=["supervisor"], filters={"fecha": "2025-05-01"}, measures=["ventas", "couta", "cobertura"])
+    assert result == [
+        {"supervisor": "S1", "ventas": 3, "couta": 30, "cobertura": 0.1},
+        {"supervisor": "S2", "ventas": 0, "couta": 20, "cobertura": 0.0},
+    ]
+
+def test_monthly_quota_is_counted_once_over_several_days(cube):
+    result = cube.query(group_by=["supervisor"], filters={"supervisor": "S1"}, date_from="2025-05-01", date_to="2025-05-31")
+    assert result[0]["ventas"] == 6
+    assert result[0]["couta"] == 30
+    assert result[0]["cobertura"] == 0.2
+
+def test_quota_adds_up_across_months_and_supervisors(cube):
+    by_zonal = {row["zonal"]: row for row in cube.query(group_by=["zonal"])}
+    # S1: May 30 + June 40; S2: May 20
+    assert by_zonal["ILO"]["couta"] == 90
+    assert by_zonal["TACNA"]["couta"] == 50
+
+def test_filters_and_vendor_names(cube):
+    result = cube.query(group_by=["dni"], filters={"zonal": ["ILO"], "supervisor": "S1"}, measures=["ventas"])
+    assert result == [
+        {"dni": "1", "nombre": "VENDEDOR 1", "ventas": 11},
+        {"dni": "2", "nombre": "VENDEDOR 2", "ventas": 1},
+    ]
+    assert cube.query(filters={"zonal": "CUSCO"}) == []
+
+def test_replace_dates_swaps_only_that_range(cube):
+    cube.replace_dates("2025-05-02", "2025-05-02", make_rows([("2025-05-02", "ILO", "S1", "1", 10, 30)]))
+    by_day = {row["fecha"]: row["ventas"] for row in cube.query(group_by=["fecha"], measures=["ventas"])}
+    assert by_day == {"2025-05-01": 3, "2025-05-02": 10, "2025-06-01": 6}
+    assert cube.stats()["rows"] == 5
+
+def test_unknown_names_are_rejected(cube):
+    with pytest.raises(ValueError):
+        cube.query(group_by=["region"])
+    with pytest.raises(ValueError):
+        cube.query(measures=["margen"])
+
+def test_querying_before_build_fails():
+    with pytest.raises(RuntimeError):
+        SalesCube().query()
@@ -0,0 +1,91 @@
+import pytest
+
+import app
+from app import IntentRouter
+
+INTENTS = """
+intents:
+  - name: ventas_zonal
+    patterns:
+      - '(?:dame )?ventas por zonal(?: de hoy)?'
+    sql: SELECT zonal, ventas FROM resumen_zonal_diario WHERE fecha = {fecha}
+    fallback_sql: SELECT zonal, COUNT(*) FROM vista_actividad_usuarios WHERE fecha = {fecha} GROUP BY zonal
+  - name: ventas_supervisor
+    patterns:
+      - 'ventas por supervisor'
+    sql: SELECT supervisor, ventas FROM resumen_supervisor_diario WHERE fecha = {fecha}
+  - name: invalid
+    patterns:
+      - '(unclosed'
+    sql: SELECT 1
+"""
+
+@pytest.fixture
+def router(tmp_path):
+    path = tmp_path / "intents.yml"
+    path.write_text(INTENTS, encoding="utf-8")
+    router = IntentRouter(str(path))
+    router.load()
+    return router
+
+def name(intent):
+    return intent["name"] if intent is not None else None
+
+def test_invalid_intents_are_skipped(router):
+    assert router.stats()["intents"] == ["ventas_zonal", "ventas_supervisor"]
+
+@pytest.mark.parametrize("message", [
+    "ventas por zonal",
+    "Dame ventas por ZONAL de hoy?",
+    "ventas por zonal del 2025-05-06",
+    "ventas por zonal para el 2025-05-06",
+])
+def test_the_whole_message_less_its_date_must_match(router, message):
+    assert name(router.match(message)) == "ventas_zonal"
+
+@pytest.mark.parametrize("message", [
+    # Other filters, a range, an accumulated date: the generic report would be wrong
+    "ventas por zonal lima norte",
+    "ventas por zonal de mayo",
+    "ventas por zonal del 2025-05-01 al 2025-05-31",
+    "ventas por zonal al 2025-05-06",
+    "cuales fueron las ventas por zonal y por supervisor",
+])
+def test_messages_with_more_than_the_report_go_to_the_llm(router, message):
+    assert router.match(message) is None
+
+def test_matches_are_counted_by_intent(router):
+    router.match("ventas por zonal")
+    router.match("ventas por supervisor")
+    router.match("ventas por zonal")
+    router.match("hola")
+    stats = router.stats()
+    assert (stats["matches"], stats["misses"]) == (3, 1)
+    assert stats["by_intent"] == {"ventas_zonal": 2, "ventas_supervisor": 1}
+
+def test_fallback_sql_until_the_summary_tables_exist(router):
+    zonal = router.match("ventas por zonal")
+    supervisor = router.match("ventas por supervisor")
+    loaded = {"resumen_zonal_diario", "resumen_supervisor_diario", "usuarios"}
+    assert IntentRouter.sql_for(zonal, loaded) == zonal["sql"]
+    assert IntentRouter.sql_for(zonal, {"usuarios"}).startswith("SELECT zonal, COUNT(*) FROM vista_actividad_usuarios")
+    # No fallback: the LLM answers
+    assert IntentRouter.sql_for(supervisor, {"usuarios"}) is None
+
+def test_a_missing_file_loads_no_intents(tmp_path):
+    router = IntentRouter(str(tmp_path / "missing.yml"))
+    router.load()
+    assert router.match("ventas por zonal") is None
+
+def test_the_shipped_intents():
+    router = IntentRouter(app.INTENTS_FILE)
+    router.load()
+    intents = [
+        router.match("reporte por zonal"),
+        router.match("Envíame la cobertura por supervisor de hoy"),
+        router.match("listado de vendedores del 2025-05-06"),
+    ]
+    assert [name(intent) for intent in intents] == router.stats()["intents"]
+    assert router.match("reporte por zonal de la zonal lima") is None
+    for intent in intents:
+        assert app.DATE_SLOT in intent["sql"] and app.DATE_SLOT in intent["fallback_sql"]
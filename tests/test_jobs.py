@@ -0,0 +1,198 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import app
+from jobs import DONE, FAILED, JobQueue, QueueFull
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+async def wait_until(predicate, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("Timed out waiting for the job queue")
+        await asyncio.sleep(0.005)
+
+def test_jobs_run_in_the_background_and_are_delivered():
+    delivered = []
+
+    async def handler(payload):
+        await asyncio.sleep(0.01)
+        return {"echo": payload["message"]}
+
+    async def deliver(job):
+        delivered.append(job)
+
+    async def main():
+        queue = JobQueue(handler, deliver, workers=2)
+        queue.start()
+        job = queue.submit({"message": "hola"}, callback_url="http://n8n/cb")
+        assert job["status"] == "queued"
+        await wait_until(lambda: delivered)
+        await queue.stop()
+        return queue, job
+
+    queue, job = run(main())
+    assert delivered[0] is job
+    assert job["status"] == DONE
+    assert job["result"] == {"echo": "hola"}
+    assert job["callback_url"] == "http://n8n/cb"
+    assert queue.get(job["job_id"]) is job
+    assert queue.stats()["done"] == 1
+
+def test_failures_and_timeouts_are_recorded_and_delivered():
+    delivered = []
+
+    async def handler(payload):
+        if payload["kind"] == "error":
+            raise ValueError("bad query")
+        await asyncio.sleep(1)
+
+    async def deliver(job):
+        delivered.append(job)
+
+    async def main():
+        queue = JobQueue(handler, deliver, workers=2, timeout=0.05)
+        queue.start()
+        failed = queue.submit({"kind": "error"})
+        slow = queue.submit({"kind": "slow"})
+        await wait_until(lambda: len(delivered) == 2)
+        await queue.stop()
+        return failed, slow
+
+    failed, slow = run(main())
+    assert (failed["status"], failed["error"]) == (FAILED, "bad query")
+    assert slow["status"] == FAILED
+    assert "did not finish" in slow["error"]
+
+def test_submit_fails_fast_when_the_queue_is_full():
+    async def main():
+        gate = asyncio.Event()
+
+        async def handler(payload):
+            await gate.wait()
+
+        async def deliver(job):
+            pass
+
+        queue = JobQueue(handler, deliver, workers=1, max_queue=1)
+        queue.start()
+        queue.submit({})
+        await asyncio.sleep(0.01)  # the worker takes the first job
+        queue.submit({})
+        with pytest.raises(QueueFull):
+            queue.submit({})
+        stats = queue.stats()
+        gate.set()
+        await queue.stop()
+        return stats
+
+    stats = run(main())
+    assert (stats["accepted"], stats["rejected"], stats["running"], stats["queued"]) == (2, 1, 1, 1)
+
+def test_submit_needs_a_started_queue():
+    async def noop(_):
+        pass
+
+    with pytest.raises(RuntimeError):
+        JobQueue(noop, noop).submit({})
+
+def test_stop_drains_queued_jobs():
+    done = []
+
+    async def handler(payload):
+        await asyncio.sleep(0.01)
+        done.append(payload["n"])
+
+    async def deliver(job):
+        pass
+
+    async def main():
+        queue = JobQueue(handler, deliver, workers=1)
+        queue.start()
+        for n in range(3):
+            queue.submit({"n": n})
+        await queue.stop(drain_timeout=2)
+
+    run(main())
+    assert done == [0, 1, 2]
+
+# WhatsApp jobs delivered to a stub callback endpoint
+
+@pytest.fixture
+def callback_stub(monkeypatch):
+    """Replace the callback client with one whose requests a handler answers; returns the list of requests."""
+    received = []
+    responses = []
+
+    def handler(request):
+        received.append(request)
+        status = responses.pop(0) if responses else 200
+        return httpx.Response(status)
+
+    monkeypatch.setattr(app, "callback_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(app, "WHATSAPP_CALLBACK_RETRIES", 2)
+    # Retry backoff without the wait
+    sleep = asyncio.sleep
+    monkeypatch.setattr(app.asyncio, "sleep", lambda delay, *args: sleep(0, *args))
+    return received, responses
+
+def test_answer_is_posted_to_the_callback(callback_stub):
+    received, _ = callback_stub
+
+    async def handler(params):
+        return {"success": True, "message": "3 filas", "original_query": params["message"]}
+
+    async def main():
+        queue = JobQueue(handler, app.deliver_whatsapp_job, workers=1)
+        queue.start()
+        job = queue.submit({"message": "reporte por zonal"}, callback_url="http://n8n/cb", original_query="reporte por zonal")
+        await queue.stop()
+        return job
+
+    job = run(main())
+    assert job["delivered"] is True
+    assert len(received) == 1
+    assert str(received[0].url) == "http://n8n/cb"
+    assert json.loads(received[0].content) == {
+        "job_id": job["job_id"], "success": True, "message": "3 filas", "original_query": "reporte por zonal"
+    }
+
+def test_failed_jobs_post_an_error_answer(callback_stub):
+    received, _ = callback_stub
+
+    async def handler(params):
+        raise RuntimeError("database down")
+
+    async def main():
+        queue = JobQueue(handler, app.deliver_whatsapp_job, workers=1)
+        queue.start()
+        job = queue.submit({"message": "hola"}, callback_url="http://n8n/cb", original_query="hola")
+        await queue.stop()
+        return job
+
+    job = run(main())
+    body = json.loads(received[0].content)
+    assert body["success"] is False
+    assert "database down" in body["message"]
+    assert job["delivered"] is True
+
+def test_callbacks_retry_server_errors_but_not_client_errors(callback_stub):
+    received, responses = callback_stub
+    responses.extend([503, 429, 200])
+    assert run(app.post_callback("http://n8n/cb", {"ok": True})) is True
+    assert len(received) == 3
+
+    received.clear()
+    responses.extend([404])
+    assert run(app.post_callback("http://n8n/cb", {"ok": True})) is False
+    assert len(received) == 1
+
+    received.clear()
+    responses.extend([500, 500, 500])
+    assert run(app.post_callback("http://n8n/cb", {"ok": True})) is False
+    assert len(received) == 3
@@ -0,0 +1,67 @@
+import json
+import math
+from datetime import date, datetime, time
+from decimal import Decimal
+
+import pytest
+
+import app
+from app import SQLQueryResult, encode_json, json_default, model_json_default, query_result
+
+ROW = {
+    "zonal": "NORTE",
+    "ventas": Decimal("12"),
+    "cobertura": Decimal("0.85"),
+    "fecha": date(2025, 5, 6),
+    "cargado": datetime(2025, 5, 6, 8, 30),
+    "hora": time(8, 30),
+    "ratio": 0.5,
+    "nada": None,
+}
+
+@pytest.fixture(params=["orjson", "json"])
+def encoder(request, monkeypatch):
+    """encode_json with orjson when it is installed, and with the json module fallback."""
+    if request.param == "orjson":
+        if app.orjson is None:
+            pytest.skip("orjson is not installed")
+    else:
+        monkeypatch.setattr(app, "orjson", None)
+    return encode_json
+
+def test_rows_encode_like_jsonable_encoder(encoder):
+    assert json.loads(encoder([ROW])) == [{
+        "zonal": "NORTE",
+        "ventas": 12,
+        "cobertura": 0.85,
+        "fecha": "2025-05-06",
+        "cargado": "2025-05-06T08:30:00",
+        "hora": "08:30:00",
+        "ratio": 0.5,
+        "nada": None,
+    }]
+
+def test_numeric_stays_a_string_for_the_response_model(encoder):
+    body = json.loads(encoder([ROW], model_json_default))
+    assert (body[0]["ventas"], body[0]["cobertura"]) == ("12", "0.85")
+
+def test_non_ascii_text_is_utf8(encoder):
+    assert encoder({"zonal": "Cañete"}).decode("utf-8") == '{"zonal":"Cañete"}'
+
+def test_integers_wider_than_64_bits_fall_back_to_json():
+    assert json.loads(encode_json({"n": 2 ** 70})) == {"n": 2 ** 70}
+
+def test_json_default():
+    assert json_default(Decimal("3")) == 3 and isinstance(json_default(Decimal("3")), int)
+    assert json_default(Decimal("2.50")) == 2.5
+    assert math.isnan(json_default(Decimal("NaN")))
+    assert json_default(b"\x01\xff") == "01ff"
+    assert json_default(memoryview(b"\x02")) == "02"
+
+def test_human_query_bodies_match_the_pydantic_response_model():
+    # Regression: the fast path must not change what /human_query clients receive
+    rows = [ROW, {**ROW, "cobertura": Decimal("1.00"), "ventas": Decimal("0")}]
+    fast = json.loads(query_result("ventas por zonal", "SELECT 1", rows).body)
+    model = json.loads(SQLQueryResult(original_query="ventas por zonal", sql_query="SELECT 1", result=rows).model_dump_json())
+    assert fast == model
+    assert fast["result"][1]["cobertura"] == "1.00"
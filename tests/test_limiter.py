@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+import pytest
+
+from limiter import CallLimiter, LimiterRejected
+
+def limiter(max_in_flight=0, rate=0, burst=1, max_waiting=10, max_wait=1.0):
+    return CallLimiter(max_in_flight, rate, burst, max_waiting, max_wait)
+
+def test_calls_wait_for_a_free_slot_in_order():
+    order = []
+
+    async def call(calls, n):
+        await calls.acquire()
+        try:
+            order.append(n)
+            await asyncio.sleep(0.02)
+        finally:
+            calls.release()
+
+    async def main():
+        calls = limiter(max_in_flight=1)
+        await asyncio.gather(*(call(calls, n) for n in range(4)))
+        return calls
+
+    stats = asyncio.run(main()).stats()
+    assert order == [0, 1, 2, 3]
+    assert (stats["acquired"], stats["in_flight"], stats["waiting"]) == (4, 0, 0)
+    assert stats["waited_seconds"] > 0
+
+def test_release_wakes_the_next_waiter():
+    async def main():
+        calls = limiter(max_in_flight=1, max_wait=5)
+        await calls.acquire()
+        waiting = asyncio.create_task(calls.acquire())
+        await asyncio.sleep(0.01)
+        assert not waiting.done() and calls.stats()["waiting"] == 1
+        started = time.monotonic()
+        calls.release()
+        await waiting
+        return time.monotonic() - started
+
+    assert asyncio.run(main()) < 0.5
+
+def test_full_wait_queue_is_rejected():
+    async def main():
+        calls = limiter(max_in_flight=1, max_waiting=1)
+        await calls.acquire()
+        waiting = asyncio.create_task(calls.acquire())
+        await asyncio.sleep(0.01)
+        with pytest.raises(LimiterRejected) as rejected:
+            await calls.acquire()
+        calls.release()
+        await waiting
+        return rejected.value, calls
+
+    rejected, calls = asyncio.run(main())
+    assert rejected.reason == "queue_full"
+    assert calls.stats()["queue_full"] == 1
+
+def test_waiting_past_the_deadline_is_rejected():
+    async def main():
+        calls = limiter(max_in_flight=1)
+        await calls.acquire()
+        with pytest.raises(LimiterRejected) as rejected:
+            await calls.acquire(max_wait=0.02)
+        return rejected.value, calls
+
+    rejected, calls = asyncio.run(main())
+    assert rejected.reason == "timeout"
+    assert (calls.stats()["timeout"], calls.stats()["waiting"]) == (1, 0)
+
+def test_token_bucket_spaces_out_calls_after_the_burst():
+    async def main():
+        calls = limiter(rate=50, burst=2)
+        started = time.monotonic()
+        for _ in range(4):
+            await calls.acquire()
+            calls.release()
+        return time.monotonic() - started
+
+    # Two calls use the burst; the other two wait 1/50 s each for a token
+    assert 0.03 <= asyncio.run(main()) < 0.5
+
+def test_try_acquire_only_takes_free_capacity():
+    calls = limiter(max_in_flight=1, rate=100, burst=1)
+    assert calls.try_acquire()
+    assert not calls.try_acquire()
+    calls.release()
+    # The slot is free again but the only token was spent
+    assert not calls.try_acquire()
+    time.sleep(0.02)
+    assert calls.try_acquire()
+    assert calls.stats()["acquired"] == 2
@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+import pytest
+
+import app
+
+SQL = "SELECT n FROM generate_series(1, 7) AS n ORDER BY n"
+
+@pytest.fixture
+def pager(db_pool):
+    pager = app.ResultPager(ttl=60, max_open=2)
+    yield pager
+    pager.close_all()
+
+def numbers(page):
+    return [row["n"] for row in page["results"]]
+
+def test_pages_continue_where_the_previous_one_stopped(pager, db_pool):
+    in_use = db_pool.stats()["in_use"]
+    first = pager.first_page(SQL, 3)
+    second = pager.next_page(first["next_page_token"])
+    last = pager.next_page(second["next_page_token"])
+    assert [numbers(first), numbers(second), numbers(last)] == [[1, 2, 3], [4, 5, 6], [7]]
+    assert second["sql"] == SQL
+    assert last["next_page_token"] is None
+    # The last page closes the cursor and returns its connection
+    assert pager.stats()["open"] == 0
+    assert db_pool.stats()["in_use"] == in_use
+
+def test_a_single_page_result_keeps_no_cursor(pager):
+    page = pager.first_page(SQL, 10)
+    assert numbers(page) == list(range(1, 8))
+    assert page["next_page_token"] is None
+    assert pager.stats()["open"] == 0
+
+def test_tokens_are_single_use(pager):
+    token = pager.first_page(SQL, 3)["next_page_token"]
+    pager.next_page(token)
+    with pytest.raises(app.PageExpired):
+        pager.next_page(token)
+
+def test_sweep_closes_abandoned_cursors(db_pool):
+    pager = app.ResultPager(ttl=0.05, max_open=2)
+    in_use = db_pool.stats()["in_use"]
+    token = pager.first_page(SQL, 3)["next_page_token"]
+    assert db_pool.stats()["in_use"] == in_use + 1
+    time.sleep(0.1)
+    pager.sweep()
+    assert pager.stats()["open"] == 0
+    assert pager.stats()["expired"] == 1
+    assert db_pool.stats()["in_use"] == in_use
+    with pytest.raises(app.PageExpired):
+        pager.next_page(token)
+
+def test_oldest_cursor_is_evicted_beyond_max_open(pager):
+    oldest = pager.first_page(SQL, 1)["next_page_token"]
+    pager.first_page(SQL, 1)
+    pager.first_page(SQL, 1)
+    assert pager.stats()["open"] == 2
+    assert pager.stats()["evicted"] == 1
+    with pytest.raises(app.PageExpired):
+        pager.next_page(oldest)
+
+# An unknown token needs no database: the client is told to start over
+
+def test_expired_tokens_ask_for_the_query_again():
+    page = app.fetch_next_page("not-a-token")
+    assert page["expired"] is True
+    assert "without page_token" in page["error"]
+    assert (page["results"], page["next_page_token"]) == ([], None)
+
+def test_whatsapp_users_are_told_to_ask_again():
+    answer = asyncio.run(app.process_whatsapp_message("ver más", 10, "not-a-token"))
+    assert answer["success"] is False
+    assert answer["page_expired"] is True
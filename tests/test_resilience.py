@@ -0,0 +1,182 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import app
+from limiter import CallLimiter, CircuitBreaker, LatencyWindow
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failures=3, cooldown=60)
+    for ok in (False, False, True, False, False):
+        ticket = breaker.allow()
+        assert ticket is not None
+        breaker.record(ticket, ok)
+    # The success reset the count
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record(breaker.allow(), False)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.allow() is None
+    assert 0 < breaker.retry_in() <= 60
+    assert breaker.stats()["opened"] == 1 and breaker.stats()["rejected"] == 1
+
+def test_breaker_lets_one_probe_through_after_the_cooldown():
+    breaker = CircuitBreaker(failures=1, cooldown=0.02)
+    breaker.record(breaker.allow(), False)
+    time.sleep(0.03)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    probe = breaker.allow()
+    assert probe is not None
+    assert breaker.allow() is None
+    # A failed probe reopens the circuit for another cooldown
+    breaker.record(probe, False)
+    assert breaker.state == CircuitBreaker.OPEN
+    time.sleep(0.03)
+    probe = breaker.allow()
+    breaker.record(probe, True)
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.retry_in() == 0
+
+def test_abandoned_probe_frees_the_half_open_slot():
+    breaker = CircuitBreaker(failures=1, cooldown=0)
+    breaker.record(breaker.allow(), False)
+    probe = breaker.allow()
+    breaker.abandon(probe)
+    assert breaker.allow() is not None
+
+def test_only_the_probe_ends_the_probe():
+    breaker = CircuitBreaker(failures=1, cooldown=0.02)
+    # Admitted while closed, still running when the circuit opens
+    earlier = breaker.allow()
+    breaker.record(breaker.allow(), False)
+    time.sleep(0.03)
+    probe = breaker.allow()
+    # e.g. the earlier call was then rejected by the limiter
+    breaker.abandon(earlier)
+    assert breaker.allow() is None
+    breaker.record(earlier, False)
+    assert breaker.allow() is None
+    # The earlier failure restarted the cooldown; after it, a new probe goes
+    breaker.abandon(probe)
+    time.sleep(0.03)
+    assert breaker.allow() is not None
+
+def test_latency_window_quantiles():
+    window = LatencyWindow(size=100)
+    assert window.quantile(0.95) is None
+    for ms in range(1, 201):
+        window.add(ms / 1000)
+    # Only the last 100 samples are kept
+    assert len(window) == 100
+    assert window.quantile(0.5) == 0.15
+    assert window.quantile(0.95) == 0.195
+    assert window.quantile(1) == 0.2
+
+# resilient_sql_completion against a stub LLM API
+
+SQL = "SELECT 1;"
+
+@pytest.fixture
+def llm_api(monkeypatch):
+    """
+    A stub LLM API answering each request with the next scripted reply: a
+    status code, "conn" for a connection error, "slow" for a late answer
+    or, once the script runs out, a quick answer. Returns the script and the
+    list of requests received.
+    """
+    script, requests = [], []
+
+    async def handler(request):
+        requests.append(request)
+        reply = script.pop(0) if script else "ok"
+        if reply == "conn":
+            raise httpx.ConnectError("connection refused")
+        if reply == "slow":
+            await asyncio.sleep(0.5)
+        if reply in ("ok", "slow"):
+            await asyncio.sleep(0.005)
+            return httpx.Response(200, json={"choices": [{"message": {"content": SQL}}], "usage": {}})
+        return httpx.Response(reply, headers={"retry-after": "0"} if reply == 429 else {})
+
+    monkeypatch.setattr(app, "llm_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(app, "LLM_RETRIES", 2)
+    monkeypatch.setattr(app, "LLM_RETRY_BASE_DELAY", 0.001)
+    monkeypatch.setattr(app, "LLM_HEDGE", True)
+    monkeypatch.setattr(app, "LLM_HEDGE_MIN_DELAY", 0.02)
+    monkeypatch.setattr(app, "LLM_HEDGE_MIN_SAMPLES", 5)
+    monkeypatch.setattr(app, "llm_limiter", CallLimiter(4, 0, 1, 10, 1))
+    monkeypatch.setattr(app, "llm_latency", LatencyWindow())
+    monkeypatch.setattr(app, "llm_breaker", CircuitBreaker(3, 60))
+    return script, requests
+
+async def call():
+    """The LLM call as convert_to_sql makes it."""
+    ticket = app.llm_breaker.allow()
+    assert ticket is not None
+    await app.llm_limiter.acquire()
+    try:
+        return await app.resilient_sql_completion({"model": "stub", "messages": []}, ticket)
+    finally:
+        app.llm_limiter.release()
+
+def test_rate_limits_and_server_errors_are_retried(llm_api):
+    script, requests = llm_api
+    script.extend([503, 429])
+    completion = asyncio.run(call())
+    assert (completion["status"], completion["sql"]) == (200, SQL)
+    assert len(requests) == 3
+    assert app.llm_breaker.state == CircuitBreaker.CLOSED
+
+def test_connection_errors_are_retried(llm_api):
+    script, requests = llm_api
+    script.append("conn")
+    completion = asyncio.run(call())
+    assert (completion["status"], completion["sql"]) == (200, SQL)
+    assert len(requests) == 2
+
+def test_bad_requests_are_not_retried(llm_api):
+    script, requests = llm_api
+    script.append(400)
+    completion = asyncio.run(call())
+    assert completion["status"] == 400 and completion["error"] == "LLM API error: 400"
+    assert len(requests) == 1
+    # A bad request says nothing about the API's health
+    assert app.llm_breaker.stats()["consecutive_failures"] == 0
+
+def test_retries_stop_once_the_circuit_opens(llm_api, monkeypatch):
+    script, requests = llm_api
+    monkeypatch.setattr(app, "llm_breaker", CircuitBreaker(2, 60))
+    script.extend([500] * 10)
+    completion = asyncio.run(call())
+    assert completion["status"] == 500
+    # The second failure opened the circuit before the last retry
+    assert len(requests) == 2
+    assert app.llm_breaker.state == CircuitBreaker.OPEN
+    assert app.llm_breaker.allow() is None
+
+def test_slow_calls_are_hedged(llm_api):
+    script, requests = llm_api
+    for _ in range(5):
+        app.llm_latency.add(0.01)
+    script.append("slow")
+    started = time.perf_counter()
+    completion = asyncio.run(call())
+    assert completion["sql"] == SQL
+    assert len(requests) == 2
+    assert time.perf_counter() - started < 0.4
+    # The hedge gave its limiter slot back
+    assert app.llm_limiter.stats()["in_flight"] == 0
+
+def test_no_hedge_without_latency_samples_or_a_free_slot(llm_api, monkeypatch):
+    script, requests = llm_api
+    script.append("slow")
+    asyncio.run(call())
+    assert len(requests) == 1
+
+    for _ in range(5):
+        app.llm_latency.add(0.01)
+    monkeypatch.setattr(app, "llm_limiter", CallLimiter(1, 0, 1, 10, 1))
+    requests.clear()
+    script.append("slow")
+    asyncio.run(call())
+    assert len(requests) == 1
@@ -0,0 +1,122 @@
+import time
+
+import pytest
+
+import app
+from app import LRUCache
+
+class Database:
+    """Stands in for execute_sql_query and the loaders' data versions."""
+
+    def __init__(self):
+        self.executed = []
+        self.versions = {"actividad_diaria": 1, "usuarios": 1}
+        self.rows = [{"zonal": "NORTE", "ventas": 3}]
+
+    def execute(self, sql_query):
+        self.executed.append(sql_query)
+        return {"error": None, "results": list(self.rows)}
+
+@pytest.fixture
+def db(monkeypatch):
+    db = Database()
+    monkeypatch.setattr(app, "execute_sql_query", db.execute)
+    monkeypatch.setattr(app.data_versions, "versions", lambda: dict(db.versions))
+    monkeypatch.setattr(app, "result_cache", LRUCache(100))
+    return db
+
+DAY_SQL = "SELECT zonal, SUM(ventas) FROM actividad_diaria WHERE fecha = '2025-05-06' GROUP BY zonal"
+
+def test_repeated_reads_are_served_from_memory(db):
+    first = app.cached_sql_query(DAY_SQL)
+    second = app.cached_sql_query(DAY_SQL)
+    assert first == second == {"error": None, "results": db.rows}
+    assert len(db.executed) == 1
+
+def test_a_new_version_of_a_table_read_makes_the_entry_stale(db):
+    app.cached_sql_query(DAY_SQL)
+    db.versions["usuarios"] = 2
+    app.cached_sql_query(DAY_SQL)
+    assert len(db.executed) == 1
+    db.versions["actividad_diaria"] = 2
+    app.cached_sql_query(DAY_SQL)
+    assert len(db.executed) == 2
+
+def test_entries_expire_after_the_max_age(db, monkeypatch):
+    app.cached_sql_query(DAY_SQL)
+    monkeypatch.setattr(app, "RESULT_CACHE_MAX_AGE", 0)
+    time.sleep(0.01)
+    app.cached_sql_query(DAY_SQL)
+    assert len(db.executed) == 2
+
+@pytest.mark.parametrize("sql_query", [
+    "SELECT * FROM actividad_diaria WHERE fecha = current_date",
+    "SELECT random() FROM usuarios",
+    "SELECT nextval('seq')",
+])
+def test_volatile_queries_are_not_cached(db, sql_query):
+    app.cached_sql_query(sql_query)
+    app.cached_sql_query(sql_query)
+    assert len(db.executed) == 2
+
+def test_errors_and_large_results_are_not_cached(db, monkeypatch):
+    monkeypatch.setattr(app, "RESULT_CACHE_MAX_ROWS", 0)
+    app.cached_sql_query(DAY_SQL)
+    app.cached_sql_query(DAY_SQL)
+    assert len(db.executed) == 2
+
+def test_unreadable_versions_bypass_the_cache(db, monkeypatch):
+    monkeypatch.setattr(app.data_versions, "versions", lambda: None)
+    app.cached_sql_query(DAY_SQL)
+    app.cached_sql_query(DAY_SQL)
+    assert len(db.executed) == 2
+    assert len(app.result_cache) == 0
+
+def test_writes_run_and_drop_the_results_of_the_tables_written(db):
+    app.cached_sql_query(DAY_SQL)
+    app.cached_sql_query("SELECT COUNT(*) FROM usuarios")
+    app.cached_sql_query("UPDATE actividad_diaria SET ventas = 0 WHERE fecha = '2025-05-06'")
+    assert len(app.result_cache) == 1
+    app.cached_sql_query(DAY_SQL)
+    assert db.executed.count(DAY_SQL) == 2
+
+def test_writes_to_unknown_tables_drop_everything(db):
+    app.cached_sql_query(DAY_SQL)
+    # A data-modifying CTE is a write, to usuarios only
+    app.cached_sql_query("WITH d AS (DELETE FROM usuarios RETURNING *) SELECT COUNT(*) FROM d")
+    assert len(app.result_cache) == 1
+    app.cached_sql_query("CALL refresh_everything()")
+    assert len(app.result_cache) == 0
+    assert len(db.executed) == 3
+
+def entry(tables, dates, versions, age=0.0):
+    return {"results": [], "tables": tables, "dates": dates, "versions": versions, "cached_at": time.monotonic() - age}
+
+def test_result_is_current():
+    versions = {"actividad_diaria": 2, "usuarios": 1}
+    assert app.result_is_current(entry(["actividad_diaria"], None, {"actividad_diaria": 2}), versions)
+    assert not app.result_is_current(entry(["actividad_diaria"], None, {"actividad_diaria": 1}), versions)
+    # Unknown dependencies: any table's new version makes it stale
+    assert not app.result_is_current(entry(None, None, {"actividad_diaria": 2, "usuarios": 0}), versions)
+    assert not app.result_is_current(entry(["usuarios"], None, {"usuarios": 1}, age=app.RESULT_CACHE_MAX_AGE + 1), versions)
+
+def test_loads_drop_only_the_entries_they_can_change(monkeypatch):
+    cache = LRUCache(10)
+    monkeypatch.setattr(app, "result_cache", cache)
+    cache.put("other_table", entry(["usuarios"], None, {"usuarios": 1}))
+    cache.put("other_dates", entry(["actividad_diaria"], ["2025-04-01", "2025-04-30"], {"actividad_diaria": 1}))
+    cache.put("same_dates", entry(["actividad_diaria"], ["2025-05-06", "2025-05-06"], {"actividad_diaria": 1}))
+    cache.put("any_date", entry(["actividad_diaria"], None, {"actividad_diaria": 1}))
+    cache.put("unknown", entry(None, None, {"actividad_diaria": 1}))
+
+    dropped = app.invalidate_results("actividad_diaria", 2, "2025-05-01", "2025-05-31")
+    assert dropped == 3
+    assert sorted(key for key, _ in cache.items()) == ["other_dates", "other_table"]
+    # Moved to the new version, so it stays current
+    assert cache.get("other_dates")["versions"] == {"actividad_diaria": 2}
+
+def test_loads_without_a_date_range_drop_every_reader(monkeypatch):
+    cache = LRUCache(10)
+    monkeypatch.setattr(app, "result_cache", cache)
+    cache.put("april", entry(["actividad_diaria"], ["2025-04-01", "2025-04-30"], {"actividad_diaria": 1}))
+    assert app.invalidate_results("actividad_diaria", 2, None, None) == 1
@@ -0,0 +1,65 @@
+import importlib.util
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from app import format_rows, query_result, sql_result, validate_result_format, validate_stream_format
+
+ROWS = [
+    {"zonal": "NORTE", "ventas": 3, "cobertura": 0.5},
+    {"zonal": "SUR", "ventas": 7, "cobertura": 1.2},
+]
+
+def test_rows_are_returned_as_they_are():
+    assert format_rows(ROWS, "rows") is ROWS
+
+def test_columns_sends_the_names_once():
+    assert format_rows(ROWS, "columns") == {
+        "columns": ["zonal", "ventas", "cobertura"],
+        "rows": [("NORTE", 3, 0.5), ("SUR", 7, 1.2)],
+    }
+
+def test_columnar_sends_one_array_per_column():
+    assert format_rows(ROWS, "columnar") == {"zonal": ["NORTE", "SUR"], "ventas": [3, 7], "cobertura": [0.5, 1.2]}
+
+def test_empty_results_have_no_columns():
+    assert format_rows([], "columns") == {"columns": [], "rows": []}
+    assert format_rows([], "columnar") == {}
+
+@pytest.mark.parametrize("result_format", ["columns", "columnar"])
+def test_formats_reach_the_response_bodies(result_format):
+    human = json.loads(query_result("ventas", "SELECT 1", ROWS, result_format=result_format).body)
+    assert human["result"] == json.loads(json.dumps(format_rows(ROWS, result_format)))
+    assert human["next_page_token"] is None
+    execute = json.loads(sql_result("SELECT 1", ROWS, result_format, next_page_token="t").body)
+    assert execute == {"sql_query": "SELECT 1", "result": human["result"], "next_page_token": "t"}
+
+def test_errors_are_json_whatever_the_format():
+    body = json.loads(query_result("ventas", "SELECT 1", [], error="boom", result_format="parquet").body)
+    assert body["error"] == "boom"
+
+def test_unknown_formats_are_rejected():
+    with pytest.raises(HTTPException) as rejected:
+        validate_result_format("xml")
+    assert rejected.value.status_code == 400
+
+@pytest.mark.skipif(importlib.util.find_spec("pyarrow") is not None, reason="pyarrow is installed")
+def test_binary_formats_need_pyarrow():
+    with pytest.raises(HTTPException, match="pyarrow"):
+        validate_result_format("arrow")
+
+def test_streams_are_always_rows():
+    validate_stream_format("ndjson", "rows")
+    with pytest.raises(HTTPException):
+        validate_stream_format("ndjson", "columnar")
+    with pytest.raises(HTTPException):
+        validate_stream_format("csv", "rows")
+
+def test_arrow_bodies_carry_the_rows_and_the_token():
+    pyarrow = pytest.importorskip("pyarrow")
+    response = query_result("ventas", "SELECT 1", ROWS, next_page_token="t", result_format="arrow")
+    table = pyarrow.ipc.open_stream(response.body).read_all()
+    assert table.to_pylist() == ROWS
+    assert table.schema.metadata[b"sql_query"] == b"SELECT 1"
+    assert response.headers["X-Next-Page-Token"] == "t"
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+import app
+from app import SQLStream
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetchmany(self, size):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+class Released:
+    """The connections close_sql_stream handed back; it runs on the DB executor, so ``wait`` for them."""
+
+    def __init__(self):
+        self.connections = []
+        self._done = threading.Event()
+
+    def __call__(self, conn, cursor):
+        self.connections.append(conn)
+        self._done.set()
+
+    def wait(self):
+        self._done.wait(1)
+        return self.connections
+
+@pytest.fixture
+def released(monkeypatch):
+    released = Released()
+    monkeypatch.setattr(app, "close_sql_stream", released)
+    monkeypatch.setattr(app, "STREAM_BATCH_SIZE", 2)
+    return released
+
+def open_stream(rows):
+    return SQLStream("conn", FakeCursor(rows[2:]), rows[:2])
+
+async def serve(response, fail_at=None):
+    """Run the ASGI response; ``send`` fails like a gone client on message number ``fail_at``."""
+    sent = []
+
+    async def receive():
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if len(sent) == fail_at:
+            raise OSError("client disconnected")
+        sent.append(message)
+
+    scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+    try:
+        await response(scope, receive, send)
+    except Exception:
+        pass
+    return b"".join(message.get("body", b"") for message in sent)
+
+def test_stream_is_read_in_batches_and_released(released):
+    rows = [{"n": n} for n in range(5)]
+    body = asyncio.run(serve(app.streaming_response(open_stream(rows), {"sql_query": "q"}, "ndjson")))
+    lines = [json.loads(line) for line in body.splitlines()]
+    assert lines[0] == {"sql_query": "q"}
+    assert lines[1:-1] == rows
+    assert lines[-1] == {"row_count": 5, "error": None}
+    assert released.wait() == ["conn"]
+
+def test_json_stream_is_one_document(released):
+    rows = [{"n": n} for n in range(3)]
+    body = asyncio.run(serve(app.streaming_response(open_stream(rows), {"sql_query": "q"}, "json")))
+    assert json.loads(body) == {"sql_query": "q", "result": rows, "row_count": 3, "error": None}
+
+# Gone before the response starts, at the header, and mid-body
+@pytest.mark.parametrize("fail_at", [0, 1, 2])
+def test_disconnected_clients_release_the_stream_once(released, fail_at):
+    rows = [{"n": n} for n in range(5)]
+    asyncio.run(serve(app.streaming_response(open_stream(rows), {}, "ndjson"), fail_at=fail_at))
+    assert released.wait() == ["conn"]
+
+def test_close_waits_for_a_running_fetch(released):
+    started, finish = threading.Event(), threading.Event()
+
+    class SlowCursor(FakeCursor):
+        def fetchmany(self, size):
+            started.set()
+            finish.wait(1)
+            return []
+
+    async def main():
+        stream = SQLStream("conn", SlowCursor([]), [])
+        fetch = asyncio.ensure_future(stream.fetch())
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 1)
+        stream.close()
+        stream.close()
+        assert released.connections == []
+        finish.set()
+        await fetch
+
+    asyncio.run(main())
+    assert released.wait() == ["conn"]
@@ -0,0 +1,118 @@
+import asyncio
+import time
+
+import pytest
+
+import app
+from app import SingleFlight
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    async def work(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return value * 2
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", work, 21) for _ in range(5)))
+
+    assert asyncio.run(main()) == [42] * 5
+    assert calls == [21]
+    assert flight.stats() == {"in_flight": 0, "calls": 5, "coalesced": 4}
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+
+    async def work(value):
+        await asyncio.sleep(0.01)
+        return value
+
+    async def main():
+        return await asyncio.gather(flight.do("a", work, 1), flight.do("b", work, 2))
+
+    assert asyncio.run(main()) == [1, 2]
+    assert flight.stats()["coalesced"] == 0
+
+def test_a_later_call_runs_again():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        return len(calls)
+
+    async def main():
+        return [await flight.do("key", work), await flight.do("key", work)]
+
+    assert asyncio.run(main()) == [1, 2]
+
+def test_errors_reach_every_waiter():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        return await asyncio.gather(flight.do("key", fail), flight.do("key", fail), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+
+def test_a_cancelled_caller_does_not_cancel_the_others():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("key", work))
+        second = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "done"
+
+# run_sql_query only shares executions that are safe to share
+
+@pytest.fixture
+def executions(monkeypatch):
+    """Replaces cached_sql_query with a slow stub; returns the SQL of every execution."""
+    executed = []
+
+    def execute(sql_query):
+        executed.append(sql_query)
+        time.sleep(0.02)
+        return {"error": None, "results": []}
+
+    monkeypatch.setattr(app, "cached_sql_query", execute)
+    return executed
+
+def run_concurrently(sql_query, times=3):
+    async def main():
+        return await asyncio.gather(*(app.run_sql_query(sql_query) for _ in range(times)))
+
+    return asyncio.run(main())
+
+def test_concurrent_identical_reads_execute_once(executions):
+    run_concurrently("SELECT zonal FROM usuarios")
+    assert len(executions) == 1
+
+@pytest.mark.parametrize("sql_query", [
+    "INSERT INTO usuarios (dni) VALUES ('1')",
+    "UPDATE usuarios SET zonal = 'NORTE'",
+    "WITH d AS (DELETE FROM usuarios RETURNING *) SELECT count(*) FROM d",
+    "SELECT nextval('seq')",
+    "SELECT random()",
+    "SELECT * FROM ventas WHERE fecha = current_date",
+])
+def test_concurrent_writes_and_volatile_queries_each_execute(executions, sql_query):
+    results = run_concurrently(sql_query)
+    assert len(executions) == 3
+    assert results == [{"error": None, "results": []}] * 3
@@ -0,0 +1,157 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import app
+from app import SQLStreamScanner
+
+def scan(*chunks):
+    scanner = SQLStreamScanner()
+    for chunk in chunks:
+        scanner.feed(chunk)
+    return scanner
+
+def test_statement_ends_at_the_first_semicolon():
+    scanner = scan("SELECT zonal, COUNT(*) FROM usuarios ", "GROUP BY zonal;", " That query groups by zonal.")
+    assert scanner.complete and scanner.error is None
+    assert scanner.sql() == "SELECT zonal, COUNT(*) FROM usuarios GROUP BY zonal;"
+
+def test_semicolons_in_literals_comments_and_identifiers_do_not_end_it():
+    text = "SELECT 'a;b' AS \"x;y\", 'it''s;' -- note; here\nFROM t /* ; */ WHERE (a = ';');"
+    # One character at a time, as a stream might split it
+    scanner = scan(*text)
+    assert scanner.complete and scanner.error is None
+    assert scanner.sql() == text
+
+def test_code_fences_are_skipped():
+    scanner = scan("``", "`sql\nWITH v AS (SELECT 1)\nSELECT * FROM v\n``", "`\nDone.")
+    assert scanner.complete and scanner.error is None
+    assert scanner.sql() == "WITH v AS (SELECT 1)\nSELECT * FROM v"
+
+def test_statement_without_terminator_is_read_to_the_end():
+    scanner = scan("SELECT 1 -", "- one")
+    assert not scanner.complete
+    assert scanner.sql() == "SELECT 1 -- one"
+    assert scanner.error is None
+
+@pytest.mark.parametrize("chunks, error", [
+    (("DELETE FROM usuarios;",), "read-only"),
+    (("I can't answer ", "that question."), "read-only"),
+    (("SELECT (1))",), "unbalanced"),
+    (("SELECT (1;",), "unbalanced"),
+    (("   ",), "did not return an SQL query"),
+])
+def test_invalid_output_is_rejected(chunks, error):
+    scanner = scan(*chunks)
+    scanner.sql()
+    assert error in scanner.error
+
+def test_rejection_happens_before_the_rest_arrives():
+    scanner = scan("UPDATE ")
+    assert scanner.error is not None
+    scanner.feed("usuarios SET ...")
+    assert scanner.text == "UPDATE "
+
+# request_sql_completion against a stub SSE endpoint
+
+def sse_transport(parts, usage=None, http_version="HTTP/1.1"):
+    """Streams ``parts`` as completion chunks, then ``usage`` and [DONE]; counts the chunks sent."""
+    sent = []
+
+    async def handler(request):
+        async def events():
+            for part in parts:
+                sent.append(part)
+                yield f"data: {json.dumps({'choices': [{'delta': {'content': part}}]})}\n\n".encode()
+            if usage is not None:
+                yield f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n".encode()
+            yield b"data: [DONE]\n\n"
+
+        return httpx.Response(
+            200, headers={"content-type": "text/event-stream"}, content=events(),
+            extensions={"http_version": http_version.encode()}
+        )
+
+    return httpx.MockTransport(handler), sent
+
+@pytest.fixture
+def llm_stub(monkeypatch):
+    def install(transport):
+        monkeypatch.setattr(app, "llm_client", httpx.AsyncClient(transport=transport))
+    return install
+
+SQL_PARTS = ["SELECT", " zonal", " FROM", " usuarios", ";"]
+
+TAIL_PARTS = [" This", " lists", " zonales."]
+
+async def complete_and_drain(payload):
+    """request_sql_completion, then wait for the background reads of what it stopped early."""
+    completion = await app.request_sql_completion(payload)
+    drains = list(app.llm_stream_drains)
+    await asyncio.gather(*drains)
+    return completion, len(drains)
+
+def test_stream_stops_at_the_end_of_the_statement(llm_stub):
+    transport, sent = sse_transport(SQL_PARTS + TAIL_PARTS, usage={"completion_tokens": 8}, http_version="HTTP/2")
+    llm_stub(transport)
+    completion, drains = asyncio.run(complete_and_drain({"stream": True}))
+    assert completion["sql"] == "SELECT zonal FROM usuarios;"
+    assert completion["error"] is None and completion["status"] == 200
+    assert completion["stopped_early"] is True
+    # The usage chunk was never read, so the tokens received are counted
+    assert completion["usage"] == {"completion_tokens": len(SQL_PARTS)}
+    # An HTTP/2 stream is reset: the rest is never sent
+    assert drains == 0
+    assert len(sent) < len(SQL_PARTS + TAIL_PARTS)
+
+def test_http1_streams_are_drained_after_the_answer(llm_stub):
+    transport, sent = sse_transport(SQL_PARTS + TAIL_PARTS, usage={"completion_tokens": 8})
+    llm_stub(transport)
+    completion, drains = asyncio.run(complete_and_drain({"stream": True}))
+    assert completion["sql"] == "SELECT zonal FROM usuarios;"
+    assert completion["usage"] == {"completion_tokens": len(SQL_PARTS)}
+    # Read to the end in the background, so the connection can be reused
+    assert drains == 1
+    assert sent == SQL_PARTS + TAIL_PARTS
+    assert not app.llm_stream_drains
+
+def test_http1_streams_are_closed_when_draining_is_off(llm_stub, monkeypatch):
+    monkeypatch.setattr(app, "LLM_STREAM_DRAIN_TIMEOUT", 0)
+    transport, sent = sse_transport(SQL_PARTS + TAIL_PARTS)
+    llm_stub(transport)
+    completion, drains = asyncio.run(complete_and_drain({"stream": True}))
+    assert completion["stopped_early"] is True
+    assert drains == 0
+    assert len(sent) < len(SQL_PARTS + TAIL_PARTS)
+
+def test_stream_read_to_the_end_reports_the_api_usage(llm_stub):
+    usage = {"prompt_tokens": 900, "completion_tokens": 4}
+    transport, _ = sse_transport(["SELECT", " 1", " FROM", " t"], usage=usage)
+    llm_stub(transport)
+    completion = asyncio.run(app.request_sql_completion({"stream": True}))
+    assert completion["sql"] == "SELECT 1 FROM t"
+    assert completion["stopped_early"] is False
+    assert completion["usage"] == usage
+
+def test_stream_stops_on_a_write_statement(llm_stub):
+    transport, sent = sse_transport(["DROP", " TABLE", " usuarios", ";"], http_version="HTTP/2")
+    llm_stub(transport)
+    completion = asyncio.run(app.request_sql_completion({"stream": True}))
+    assert completion["sql"] == "" and "read-only" in completion["error"]
+    assert completion["stopped_early"] is True
+    assert len(sent) < 4
+
+def test_non_streamed_responses_are_still_parsed(llm_stub):
+    usage = {"completion_tokens": 5}
+    body = {"choices": [{"message": {"content": "```sql\nSELECT 1;\n```"}}], "usage": usage}
+    llm_stub(httpx.MockTransport(lambda request: httpx.Response(200, json=body)))
+    completion = asyncio.run(app.request_sql_completion({"stream": False}))
+    assert (completion["sql"], completion["usage"], completion["stopped_early"]) == ("SELECT 1;", usage, False)
+
+def test_api_errors_are_returned_with_their_status(llm_stub):
+    llm_stub(httpx.MockTransport(lambda request: httpx.Response(429, headers={"retry-after": "2"}, text="slow down")))
+    completion = asyncio.run(app.request_sql_completion({"stream": True}))
+    assert completion["status"] == 429 and completion["retry_after"] == "2"
+    assert completion["error"] == "LLM API error: 429" and completion["sql"] == ""
@@ -0,0 +1,60 @@
+import pytest
+
+from app import DATE_SLOT, make_sql_template, render_sql_template, sql_template_key, template_date
+
+FINGERPRINT = "schema-v1"
+
+SQL = "SELECT zonal, SUM(ventas) FROM actividad_diaria WHERE fecha = '2025-05-06' GROUP BY zonal"
+
+def test_sql_for_the_requested_date_becomes_a_template():
+    template = make_sql_template(SQL, "2025-05-06")
+    assert template == SQL.replace("'2025-05-06'", DATE_SLOT)
+    assert render_sql_template(template, "2025-06-01") == SQL.replace("2025-05-06", "2025-06-01")
+
+@pytest.mark.parametrize("sql_query", [
+    # A range, a fixed date other than the one asked for, no date at all
+    "SELECT * FROM actividad_diaria WHERE fecha BETWEEN '2025-05-01' AND '2025-05-06'",
+    "SELECT * FROM actividad_diaria WHERE fecha = '2025-01-01'",
+    "SELECT * FROM actividad_diaria",
+])
+def test_other_sql_is_not_templated(sql_query):
+    assert make_sql_template(sql_query, "2025-05-06") is None
+
+def test_templates_only_render_valid_dates():
+    template = make_sql_template(SQL, "2025-05-06")
+    for bad in ("2025-5-6", "2025-02-30", "'; DROP TABLE usuarios; --"):
+        with pytest.raises(ValueError):
+            render_sql_template(template, bad)
+
+@pytest.mark.parametrize("query, date, expected", [
+    ("ventas del 2025-05-06", None, "2025-05-06"),
+    ("ventas de hoy", "2025-05-06", "2025-05-06"),
+    ("ventas del 2025-05-06", "2025-05-06", "2025-05-06"),
+    # Several dates, a message and a parameter that disagree, no date, an invalid one
+    ("ventas del 2025-05-01 al 2025-05-31", None, None),
+    ("ventas del 2025-05-06", "2025-05-07", None),
+    ("ventas", None, None),
+    ("ventas del 2025-02-30", None, None),
+])
+def test_template_date(query, date, expected):
+    assert template_date(query, date) == expected
+
+def test_single_day_questions_share_a_template_key():
+    keys = {
+        sql_template_key(query, FINGERPRINT)
+        for query in ("Ventas del 2025-05-06", "ventas 2025-05-07", "ventas para el dia 2025-05-08", "ventas de la fecha 2025-05-09")
+    }
+    assert len(keys) == 1
+
+@pytest.mark.parametrize("other", [
+    "ventas al 2025-05-06",
+    "ventas hasta el 2025-05-06",
+    "ventas desde el 2025-05-06",
+])
+def test_range_connectors_stay_in_the_key(other):
+    # "al" is accumulated up to the date, not that one day
+    assert sql_template_key(other, FINGERPRINT) != sql_template_key("ventas del 2025-05-06", FINGERPRINT)
+
+def test_keys_change_with_the_schema():
+    assert sql_template_key("ventas del 2025-05-06", "schema-v2") != sql_template_key("ventas del 2025-05-06", FINGERPRINT)
+    assert sql_template_key("ventas del 2025-05-06", None) is None
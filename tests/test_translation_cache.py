@@ -0,0 +1,64 @@
+from app import LRUCache, normalize_query, translation_cache_key
+
+def test_questions_are_normalized_before_keying():
+    assert normalize_query("  ¿Cuántas  VENTAS hubo? ") == "cuantas ventas hubo"
+    key = translation_cache_key("¿Cuántas ventas hubo?", "2025-05-06", "schema-v1")
+    assert key == translation_cache_key("cuantas  ventas hubo", "2025-05-06", "schema-v1")
+
+def test_keys_depend_on_the_date_and_the_schema():
+    key = translation_cache_key("ventas", "2025-05-06", "schema-v1")
+    assert key != translation_cache_key("ventas", "2025-05-07", "schema-v1")
+    assert key != translation_cache_key("ventas", None, "schema-v1")
+    assert key != translation_cache_key("ventas", "2025-05-06", "schema-v2")
+    # Without a schema fingerprint nothing is cached
+    assert translation_cache_key("ventas", "2025-05-06", None) is None
+
+def test_least_recently_used_entries_are_evicted():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats() == {"size": 2, "max_size": 2, "hits": 3, "misses": 1, "evictions": 1}
+
+def test_byte_budget_is_enforced():
+    cache = LRUCache(10, max_bytes=100)
+    cache.put("a", "x", size=60)
+    cache.put("b", "y", size=60)
+    assert cache.get("a") is None and cache.get("b") == "y"
+    # An entry bigger than the whole budget is not stored
+    cache.put("c", "z", size=101)
+    assert cache.get("c") is None
+    assert cache.stats()["bytes"] == 60
+
+def test_a_disabled_cache_stores_nothing():
+    cache = LRUCache(0)
+    cache.put("a", 1)
+    assert len(cache) == 0
+
+def test_entries_survive_a_restart(tmp_path):
+    path = str(tmp_path / "translations.json")
+    cache = LRUCache(10, path)
+    cache.put("a", "SELECT 1")
+    cache.put("b", "SELECT 2")
+    cache.get("a")
+    cache.save()
+    assert not (tmp_path / "translations.json.tmp").exists()
+
+    restored = LRUCache(10, path)
+    restored.load()
+    assert (restored.get("a"), restored.get("b")) == ("SELECT 1", "SELECT 2")
+    # Recency is kept: "b" was the least recently used when saved
+    small = LRUCache(1, path)
+    small.load()
+    assert small.get("a") == "SELECT 1" and small.get("b") is None
+
+def test_a_missing_or_broken_file_starts_empty(tmp_path):
+    LRUCache(10, str(tmp_path / "missing.json")).load()
+    broken = tmp_path / "broken.json"
+    broken.write_text("{not json")
+    cache = LRUCache(10, str(broken))
+    cache.load()
+    assert len(cache) == 0
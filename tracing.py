@@ -0,0 +1,247 @@
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import secrets
+import sys
+import threading
+import time
+from collections import Counter as FrameCounter
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+class Span:
+    """One timed operation inside a trace."""
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start", "duration_ms", "tags", "error")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], tags: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self.duration_ms: Optional[float] = None
+        self.tags = dict(tags)
+        self.error: Optional[str] = None
+
+    def tag(self, **tags: Any):
+        self.tags.update(tags)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": self.duration_ms,
+            "tags": self.tags,
+            "error": self.error,
+        }
+
+class _NoopSpan:
+    """Returned when the current request is not traced, so callers can tag unconditionally."""
+
+    def tag(self, **tags: Any):
+        pass
+
+NOOP_SPAN = _NoopSpan()
+
+class Trace:
+    """The spans of one request. Spans may be added from executor threads."""
+
+    def __init__(self, name: str, tags: Dict[str, Any]):
+        self.trace_id = secrets.token_hex(16)
+        self._lock = threading.Lock()
+        self.spans: List[Span] = []
+        self.root = Span(self, name, None, tags)
+        self.spans.append(self.root)
+        # Set when the request was profiled
+        self.profile_path: Optional[str] = None
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = [span.to_dict() for span in self.spans]
+        return {"trace_id": self.trace_id, "name": self.root.name, "spans": spans}
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+def current_span():
+    return _current_span.get() or NOOP_SPAN
+
+@contextmanager
+def span(name: str, **tags: Any):
+    """Time a block as a child of the current span; a no-op outside a trace."""
+    parent = _current_span.get()
+    if parent is None:
+        yield NOOP_SPAN
+        return
+    child = Span(parent.trace, name, parent.span_id, tags)
+    token = _current_span.set(child)
+    started = time.perf_counter()
+    try:
+        yield child
+    except BaseException as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        child.duration_ms = round((time.perf_counter() - started) * 1000, 3)
+        _current_span.reset(token)
+        parent.trace.add(child)
+
+class TraceExporter:
+    """
+    Writes finished traces as JSON lines to ``path`` and/or POSTs them to
+    ``collector_url``, from a background thread so requests never wait on
+    the export. Traces are dropped (and counted) when the queue is full.
+    """
+
+    def __init__(self, path: Optional[str], collector_url: Optional[str], sample_rate: float, max_queue: int = 1000):
+        self.path = path
+        self.collector_url = collector_url
+        self.sample_rate = sample_rate
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"exported": 0, "dropped": 0, "errors": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path or self.collector_url)
+
+    def sampled(self) -> bool:
+        return self.enabled and random.random() < self.sample_rate
+
+    @contextmanager
+    def trace(self, name: str, force: bool = False, **tags: Any):
+        """Root span for a request; yields None when the request is not sampled."""
+        if not (force or self.sampled()):
+            yield None
+            return
+        trace = Trace(name, tags)
+        token = _current_span.set(trace.root)
+        started = time.perf_counter()
+        try:
+            yield trace
+        except BaseException as e:
+            trace.root.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            trace.root.duration_ms = round((time.perf_counter() - started) * 1000, 3)
+            _current_span.reset(token)
+            self.export(trace)
+
+    def export(self, trace: Trace):
+        if not self.enabled:
+            return
+        try:
+            self._queue.put_nowait(trace.to_dict())
+        except queue.Full:
+            self._stats["dropped"] += 1
+
+    def start(self):
+        if self.enabled and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        with httpx.Client(timeout=5) as client:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    return
+                try:
+                    if self.path:
+                        with open(self.path, "a", encoding="utf-8") as f:
+                            f.write(json.dumps(item, default=str) + "\n")
+                    if self.collector_url:
+                        client.post(self.collector_url, json=item)
+                    self._stats["exported"] += 1
+                except Exception as e:
+                    self._stats["errors"] += 1
+                    logger.warning(f"Could not export trace {item['trace_id']}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "sample_rate": self.sample_rate, "queued": self._queue.qsize(), **self._stats}
+
+class SamplingProfiler:
+    """
+    Samples the Python stacks of every thread each ``interval`` seconds while
+    it runs, and counts them as collapsed stacks ("outer;inner count"), the
+    input format of flamegraph.pl and speedscope.
+
+    A request runs on the event loop thread and on executor threads, so all
+    threads are sampled; under concurrent traffic the profile also contains
+    whatever else the process was doing.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: FrameCounter = FrameCounter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def save(self, directory: str, name: str) -> str:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{name}.collapsed")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.collapsed())
+        return path
+
+@contextmanager
+def trace_request(exporter: TraceExporter, name: str, profile: bool = False, interval: float = 0.005, profile_dir: str = "profiles", **tags: Any):
+    """
+    Root span for a request: sampled by the exporter, or always when
+    ``profile`` is set, in which case the sampling profiler also runs for
+    the duration of the block and its output is saved under ``profile_dir``.
+    """
+    with exporter.trace(name, force=profile, **tags) as trace:
+        if not profile:
+            yield trace
+            return
+        with SamplingProfiler(interval) as profiler:
+            yield trace
+        trace.profile_path = profiler.save(profile_dir, trace.trace_id)
+        trace.root.tag(profile=trace.profile_path)
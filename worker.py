@@ -0,0 +1,35 @@
+"""
+Worker process for QUEUE_BACKEND=rabbitmq: consumes the WhatsApp queries the
+API publishes to WORKER_QUEUE, answers them with the same code as the API
+and replies to the caller.
+
+    QUEUE_BACKEND=rabbitmq CUBE_ENABLED=false python worker.py
+
+Run as many as needed, on any host that reaches RabbitMQ, Postgres and the
+LLM API. Each one runs at most WORKER_PREFETCH queries at a time.
+"""
+import asyncio
+import logging
+import signal
+
+import app
+
+logger = logging.getLogger("worker")
+
+async def main():
+    if not isinstance(app.broker, app.RabbitMQBroker):
+        raise SystemExit("worker.py needs QUEUE_BACKEND=rabbitmq")
+    # The API's startup: database pool, caches, LLM client and the broker connection
+    async with app.lifespan(app.app):
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        server = asyncio.create_task(app.broker.serve(app.serve_worker_job, app.WORKER_PREFETCH))
+        logger.info(f"Consuming {app.WORKER_QUEUE} with prefetch {app.WORKER_PREFETCH}")
+        await asyncio.wait([server, asyncio.create_task(stop.wait())], return_when=asyncio.FIRST_COMPLETED)
+        server.cancel()
+        await asyncio.gather(server, return_exceptions=True)
+
+if __name__ == "__main__":
+    asyncio.run(main())